@@ -1,7 +1,8 @@
 from django.contrib import admin
-from django.utils.html import format_html  # For making HTML safe
+from django.utils.html import format_html, format_html_join  # For making HTML safe
 from django.urls import reverse  # For creating links to related objects
-from .models import Room, RoomImage, LandlordInquiry, TenantInquiry, Colony
+from .dedup import similar_rooms, similar_images
+from .models import Room, RoomImage, LandlordInquiry, TenantInquiry, Colony, RoomStatHourly, SavedSearch, RentStat
 
 admin.site.register(Colony)
 
@@ -11,17 +12,43 @@ class RoomImageInline(admin.TabularInline):
     extra = 1
 
 class RoomAdmin(admin.ModelAdmin):
-    list_display = ('title', 'colony_name', 'price', 'landlord_name', 'landlord_phone', 'is_available', 'google_map_link', 'total_inventory' )
+    list_display = ('title', 'colony_name', 'price', 'landlord_name', 'landlord_phone', 'is_available', 'google_map_link', 'total_inventory', 'popularity_score' )
     search_fields = ('title', 'colony_name', 'landlord_name')
     list_editable = ('total_inventory', 'is_available')
     list_filter = ('is_available', 'room_type')
+    readonly_fields = ('possible_duplicates', 'video_status', 'video_duration')
     inlines = [RoomImageInline]
 
+    # --- Near-duplicate listings (same text or same photos), found via hash bands ---
+    def possible_duplicates(self, obj):
+        if obj is None or obj._state.adding:
+            return "-"
+
+        found = {}
+        for distance, other in similar_rooms(obj):
+            found.setdefault(other.pk, (other, f"similar text, {distance} bits apart"))
+        for image in obj.images.all():
+            for distance, other in similar_images(image):
+                found.setdefault(other.room_id, (other.room, f"same photo, {distance} bits apart"))
+
+        if not found:
+            return "None found"
+
+        return format_html_join(
+            format_html("<br>"),
+            '<a href="{}">{}</a> ({})',
+            ((reverse("admin:api_room_change", args=[room.pk]), room.title, reason) for room, reason in found.values()),
+        )
+
+    possible_duplicates.short_description = 'Possible Duplicates'
+
 # Custom Tenant Inquiry Admin
 class TenantInquiryAdmin(admin.ModelAdmin):
     # Update list_display to use the NEW link function
     list_display = ('name', 'phone_number', 'get_room_link', 'is_connected', 'created_at')
     list_editable = ('is_connected',)
+    # get_room_link reads obj.room, fetch it in the same query
+    list_select_related = ('room',)
     
     search_fields = ('name', 'phone_number', 'room__title', 'room__landlord_name')
 
@@ -52,7 +79,36 @@ class TenantInquiryAdmin(admin.ModelAdmin):
         return obj.room.landlord_phone
     get_broker_phone.short_description = 'Broker Phone'
 
+# Hourly view/inquiry rollups (written by api.analytics)
+class RoomStatHourlyAdmin(admin.ModelAdmin):
+    list_display = ('room', 'hour', 'views', 'inquiries')
+    list_select_related = ('room',)
+    date_hierarchy = 'hour'
+
+# Tenants waiting for WhatsApp alerts
+class SavedSearchAdmin(admin.ModelAdmin):
+    list_display = ('phone_number', 'colony_name', 'room_type', 'tenant_type', 'min_price', 'max_price', 'is_active', 'created_at')
+    list_editable = ('is_active',)
+    list_filter = ('is_active', 'room_type', 'tenant_type')
+    search_fields = ('phone_number', 'colony_name')
+
+# Read-only view of the rent numbers behind /api/stats/rent/
+class RentStatAdmin(admin.ModelAdmin):
+    list_display = ('colony_name', 'room_type', 'count', 'min_price', 'p25', 'median', 'p75', 'max_price', 'updated_at')
+    list_filter = ('room_type',)
+    search_fields = ('colony_name',)
+    exclude = ('histogram',)
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
 # Register the models
 admin.site.register(Room, RoomAdmin)
 admin.site.register(LandlordInquiry)
-admin.site.register(TenantInquiry, TenantInquiryAdmin)
\ No newline at end of file
+admin.site.register(TenantInquiry, TenantInquiryAdmin)
+admin.site.register(RoomStatHourly, RoomStatHourlyAdmin)
+admin.site.register(SavedSearch, SavedSearchAdmin)
+admin.site.register(RentStat, RentStatAdmin)
\ No newline at end of file
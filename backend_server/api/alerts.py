@@ -0,0 +1,223 @@
+import math
+import re
+import threading
+import time
+from collections import defaultdict
+from datetime import timedelta
+from itertools import product
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Max
+from django.utils import timezone
+
+ANY = ""
+
+# Max rooms listed in one WhatsApp message, the rest are summarised
+MAX_ROOMS_PER_MESSAGE = 5
+
+# Active saved searches one phone can have, the endpoint needs no login
+MAX_SEARCHES_PER_PHONE = 5
+
+
+def normalize_colony(name):
+    return (name or "").strip().lower()
+
+
+def whatsapp_number(phone):
+    """Meta wants the country code, tenants usually type just the 10 digits."""
+    digits = re.sub(r"\D", "", phone or "")
+    if len(digits) == 10:
+        digits = "91" + digits
+    return digits
+
+
+def is_indian_mobile(number):
+    return re.fullmatch(r"91[6-9]\d{9}", number) is not None
+
+
+class IntervalTree:
+    """
+    Static centered interval tree over (min, max, phone) price ranges. A lookup walks one path
+    down the tree and only touches ranges that contain the price (plus one miss per level),
+    whether the searches are "under 6000", "above 4000" or "4000 to 6000".
+    """
+
+    __slots__ = ('center', 'by_low', 'by_high', 'left', 'right')
+
+    def __init__(self, entries):
+        endpoints = sorted({entry[0] for entry in entries} | {entry[1] for entry in entries if entry[1] != math.inf})
+        self.center = endpoints[len(endpoints) // 2]
+
+        here, left, right = [], [], []
+        for entry in entries:
+            if entry[1] < self.center:
+                left.append(entry)
+            elif entry[0] > self.center:
+                right.append(entry)
+            else:
+                here.append(entry)
+
+        # Every range here contains the center, so one sorted end is enough to know where to stop
+        self.by_low = sorted(here, key=lambda entry: entry[0])
+        self.by_high = sorted(here, key=lambda entry: entry[1], reverse=True)
+        self.left = IntervalTree(left) if left else None
+        self.right = IntervalTree(right) if right else None
+
+    def stab(self, price):
+        """Yields the ranges that contain price."""
+        node = self
+        while node is not None:
+            if price < node.center:
+                for entry in node.by_low:
+                    if entry[0] > price:
+                        break
+                    yield entry
+                node = node.left
+            else:
+                for entry in node.by_high:
+                    if entry[1] < price:
+                        break
+                    yield entry
+                node = node.right if price > node.center else None
+
+
+class SavedSearchIndex:
+    """
+    In-memory index of active saved searches.
+
+    Searches are grouped by their exact (colony, room_type, tenant_type) key, empty meaning "any",
+    so a room only has to look at the handful of keys it could match. Inside a key the price
+    ranges sit in an IntervalTree, so only the searches whose range fits the room are visited.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = None
+        self._buckets = {}  # key -> IntervalTree of (min, max, phone)
+
+    def _refresh(self):
+        from .models import SavedSearch
+
+        # Cheap check so searches saved by another worker process are picked up too
+        version = tuple(SavedSearch.objects.aggregate(n=Count('id'), latest=Max('updated_at')).values())
+        if version == self._version:
+            return
+
+        grouped = defaultdict(list)
+        searches = SavedSearch.objects.filter(is_active=True).values_list(
+            'colony_name', 'room_type', 'tenant_type', 'min_price', 'max_price', 'phone_number'
+        )
+        for colony, room_type, tenant_type, min_price, max_price, phone in searches:
+            low = min_price if min_price is not None else 0
+            high = max_price if max_price is not None else math.inf
+            grouped[(normalize_colony(colony), room_type, tenant_type)].append((low, high, phone))
+
+        self._buckets = {key: IntervalTree(entries) for key, entries in grouped.items()}
+        self._version = version
+
+    def match(self, room):
+        """Returns the set of phone numbers whose saved search fits this room."""
+        with self._lock:
+            self._refresh()
+            buckets = self._buckets
+
+        # A room open to anyone also fits tenants who asked for boys/girls/family only
+        if room.tenant_type == 'ANY':
+            tenant_keys = [ANY] + [choice for choice, _ in room.TENANT_CHOICES]
+        else:
+            tenant_keys = [ANY, room.tenant_type]
+
+        phones = set()
+        for key in product([ANY, normalize_colony(room.colony_name)], [ANY, room.room_type], tenant_keys):
+            bucket = buckets.get(key)
+            if bucket is not None:
+                phones.update(phone for _, _, phone in bucket.stab(room.price))
+        return phones
+
+
+class AlertOutbox:
+    """Collects matched rooms per phone and sends them as one WhatsApp message, at most once per interval."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending = defaultdict(dict)  # phone -> {room_id: line}
+        self._worker = None
+
+    def queue(self, phone, room):
+        line = f"• {room.title} - ₹{room.price} ({room.colony_name})\n  {settings.FRONTEND_URL}/rooms/{room.pk}"
+        with self._lock:
+            self._pending[whatsapp_number(phone)][room.pk] = line
+            if self._worker is None:
+                self._start_worker()
+
+    def _start_worker(self):
+        def run():
+            while True:
+                time.sleep(settings.ALERT_FLUSH_SECONDS)
+                self.flush()
+
+        self._worker = threading.Thread(target=run, daemon=True)
+        self._worker.start()
+
+    def flush(self):
+        """Sends everything that isn't rate limited. Returns the number of messages sent."""
+        from .views import send_simple_whatsapp
+
+        with self._lock:
+            pending, self._pending = self._pending, defaultdict(dict)
+
+        ready = {}
+        for phone, rooms in pending.items():
+            try:
+                claimed = self.claim(phone)
+            except Exception as e:
+                print(f"Alert Claim Error: {e}")
+                claimed = False
+            if claimed:
+                ready[phone] = list(rooms.values())
+            else:
+                # Recipients messaged recently keep collecting rooms until the next flush
+                with self._lock:
+                    self._pending[phone] = {**rooms, **self._pending[phone]}
+
+        for phone, lines in ready.items():
+            text = "🏠 *New rooms matching your ApnaRoom alert:*\n\n" + "\n".join(lines[:MAX_ROOMS_PER_MESSAGE])
+            if len(lines) > MAX_ROOMS_PER_MESSAGE:
+                text += f"\n\n...and {len(lines) - MAX_ROOMS_PER_MESSAGE} more on {settings.FRONTEND_URL}/rooms"
+            text += "\n\n_Reply STOP ALERTS to unsubscribe._"
+            try:
+                send_simple_whatsapp(phone, text)
+            except Exception as e:
+                print(f"Alert Send Error: {e}")
+
+        return len(ready)
+
+    def claim(self, phone):
+        """
+        Records that phone is being messaged now, unless it already was within ALERT_MIN_INTERVAL_SECONDS.
+        Kept on the SavedSearch rows, so the limit holds across worker processes and restarts.
+        """
+        from .models import SavedSearch
+
+        now = timezone.now()
+        with transaction.atomic():
+            # Row locks, so two processes flushing at the same time can't both send
+            sent = SavedSearch.objects.select_for_update().filter(phone_number=phone).values_list('last_alerted_at', flat=True)
+            last = max(filter(None, sent), default=None)
+            if last is not None and now - last < timedelta(seconds=settings.ALERT_MIN_INTERVAL_SECONDS):
+                return False
+            SavedSearch.objects.filter(phone_number=phone).update(last_alerted_at=now)
+        return True
+
+
+saved_search_index = SavedSearchIndex()
+alert_outbox = AlertOutbox()
+
+
+def notify_matching_searches(room):
+    try:
+        for phone in saved_search_index.match(room):
+            alert_outbox.queue(phone, room)
+    except Exception as e:
+        print(f"Saved Search Match Error: {e}")
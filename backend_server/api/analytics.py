@@ -0,0 +1,131 @@
+import atexit
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+# How much one event adds to Room.popularity_score
+VIEW_WEIGHT = 1.0
+INQUIRY_WEIGHT = 10.0
+
+
+def current_hour():
+    return timezone.now().replace(minute=0, second=0, microsecond=0)
+
+
+class StatsBuffer:
+    """Counts room views/inquiries in memory and writes them to RoomStatHourly in bulk."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending = defaultdict(lambda: [0, 0])  # (room_id, hour) -> [views, inquiries]
+        self._size = 0
+        self._worker = None
+        self._wake = threading.Event()
+        # Only one flush at a time (the worker, plus atexit/commands calling flush() directly)
+        self._flushing = threading.Lock()
+
+    def record_view(self, room_id):
+        self._add(room_id, 0)
+
+    def record_inquiry(self, room_id):
+        self._add(room_id, 1)
+
+    def _add(self, room_id, slot):
+        with self._lock:
+            self._pending[(room_id, current_hour())][slot] += 1
+            self._size += 1
+            full = self._size >= settings.ANALYTICS_MAX_BUFFER
+            if self._worker is None:
+                self._start_worker()
+
+        # Don't wait for the timer if traffic spikes, a flush already running will take these too
+        if full and not self._flushing.locked():
+            self._wake.set()
+
+    def _start_worker(self):
+        def run():
+            while True:
+                self._wake.wait(settings.ANALYTICS_FLUSH_SECONDS)
+                self._wake.clear()
+                if not self.flush() and self._size:
+                    # The write failed and the counts went back into the buffer,
+                    # give the database a full interval instead of retrying on every view
+                    time.sleep(settings.ANALYTICS_FLUSH_SECONDS)
+
+        self._worker = threading.Thread(target=run, daemon=True)
+        self._worker.start()
+
+    def flush(self):
+        """Writes everything buffered so far. Returns the number of rollup rows touched."""
+        with self._flushing:
+            return self._flush()
+
+    def _flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, defaultdict(lambda: [0, 0])
+            self._size = 0
+
+        if not pending:
+            return 0
+
+        from .models import Room, RoomStatHourly
+
+        try:
+            # Rooms can be deleted between the view and the flush
+            live_ids = set(
+                Room.objects.filter(pk__in={room_id for room_id, _ in pending}).values_list('pk', flat=True)
+            )
+            live = {key: counts for key, counts in pending.items() if key[0] in live_ids}
+
+            with transaction.atomic():
+                # Make sure every (room, hour) row exists, then add to all of them in one bulk_update
+                RoomStatHourly.objects.bulk_create(
+                    [RoomStatHourly(room_id=room_id, hour=hour) for room_id, hour in live],
+                    ignore_conflicts=True,
+                )
+                # Locked so a flush from another worker process can't overwrite these counts
+                stats = RoomStatHourly.objects.select_for_update().filter(
+                    room_id__in=live_ids, hour__in={hour for _, hour in live}
+                ).order_by('pk')
+
+                changed = []
+                for stat in stats:
+                    counts = live.get((stat.room_id, stat.hour))
+                    if counts:
+                        stat.views += counts[0]
+                        stat.inquiries += counts[1]
+                        changed.append(stat)
+                RoomStatHourly.objects.bulk_update(changed, ['views', 'inquiries'], batch_size=500)
+
+                score_delta = defaultdict(float)
+                for (room_id, _), (views, inquiries) in live.items():
+                    score_delta[room_id] += views * VIEW_WEIGHT + inquiries * INQUIRY_WEIGHT
+
+                # bulk_update skips Room.save(), so is_available and the signals are left alone
+                rooms = list(
+                    Room.objects.select_for_update().filter(pk__in=score_delta).only('pk', 'popularity_score').order_by('pk')
+                )
+                for room in rooms:
+                    room.popularity_score += score_delta[room.pk]
+                Room.objects.bulk_update(rooms, ['popularity_score'], batch_size=500)
+        except Exception as e:
+            print(f"Analytics Flush Error: {e}")
+            # Put the counts back so the next flush retries them
+            with self._lock:
+                for key, (views, inquiries) in pending.items():
+                    self._pending[key][0] += views
+                    self._pending[key][1] += inquiries
+                    self._size += views + inquiries
+            return 0
+
+        return len(live)
+
+
+stats_buffer = StatsBuffer()
+
+# Don't lose the last few seconds of counts when the worker restarts
+atexit.register(stats_buffer.flush)
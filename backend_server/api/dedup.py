@@ -0,0 +1,129 @@
+import hashlib
+import re
+from collections import defaultdict
+
+from django.db.models import Q
+from PIL import Image
+
+# 64-bit hashes cut into 4 bands of 16 bits. Two hashes within 3 bits of each other
+# always share at least one band, so an indexed band lookup finds them without pairwise scans.
+HASH_BITS = 64
+BANDS = 4
+BAND_BITS = HASH_BITS // BANDS
+
+# Larger distances would need more bands, a pair 4 bits apart can differ in every band
+MAX_TEXT_DISTANCE = BANDS - 1
+MAX_IMAGE_DISTANCE = BANDS - 1
+
+
+def to_signed(value):
+    """BigIntegerField is signed, the hashes are not."""
+    return value - (1 << HASH_BITS) if value >= 1 << (HASH_BITS - 1) else value
+
+
+def to_unsigned(value):
+    return value & ((1 << HASH_BITS) - 1)
+
+
+def bands(value):
+    value = to_unsigned(value)
+    return [(value >> (BAND_BITS * i)) & ((1 << BAND_BITS) - 1) for i in range(BANDS)]
+
+
+def distance(a, b):
+    return (to_unsigned(a) ^ to_unsigned(b)).bit_count()
+
+
+def text_simhash(*parts):
+    """Simhash over words and word pairs, so small edits to an address only flip a few bits."""
+    words = re.findall(r"[a-z0-9]+", " ".join(part or "" for part in parts).lower())
+    features = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+    if not features:
+        return None
+
+    weights = [0] * HASH_BITS
+    for feature in features:
+        h = int.from_bytes(hashlib.blake2b(feature.encode(), digest_size=8).digest(), 'big')
+        for bit in range(HASH_BITS):
+            weights[bit] += 1 if h >> bit & 1 else -1
+
+    value = 0
+    for bit, weight in enumerate(weights):
+        if weight > 0:
+            value |= 1 << bit
+    return to_signed(value)
+
+
+def image_dhash(file):
+    """dHash: shrink to 9x8 grey pixels and record whether each pixel is brighter than its right neighbour."""
+    with Image.open(file) as image:
+        pixels = image.convert('L').resize((9, 8), Image.Resampling.LANCZOS).tobytes()
+
+    value = 0
+    for row in range(8):
+        for col in range(8):
+            left, right = pixels[row * 9 + col], pixels[row * 9 + col + 1]
+            value = value << 1 | (left > right)
+    return to_signed(value)
+
+
+def band_filter(prefix, value):
+    """Q matching rows that share at least one band with value, e.g. text_band_0=... | text_band_1=..."""
+    query = Q()
+    for i, band in enumerate(bands(value)):
+        query |= Q(**{f"{prefix}_band_{i}": band})
+    return query
+
+
+def similar_rooms(room, max_distance=MAX_TEXT_DISTANCE):
+    """Other rooms whose title/address/colony simhash is within max_distance bits, closest first."""
+    from .models import Room
+
+    if room.text_hash is None:
+        return []
+
+    candidates = Room.objects.filter(band_filter('text', room.text_hash)).exclude(pk=room.pk)
+    matches = [(distance(room.text_hash, other.text_hash), other) for other in candidates]
+    return sorted([m for m in matches if m[0] <= max_distance], key=lambda m: m[0])
+
+
+def similar_images(image, max_distance=MAX_IMAGE_DISTANCE):
+    """Images of other rooms that look like this one, closest first."""
+    from .models import RoomImage
+
+    if image.image_hash is None:
+        return []
+
+    candidates = (
+        RoomImage.objects.filter(band_filter('image', image.image_hash))
+        .exclude(room_id=image.room_id)
+        .select_related('room')
+    )
+    matches = [(distance(image.image_hash, other.image_hash), other) for other in candidates]
+    return sorted([m for m in matches if m[0] <= max_distance], key=lambda m: m[0])
+
+
+def duplicate_pairs(rows, max_distance):
+    """
+    Batch version for the report: rows are (key, group, hash) tuples.
+    Buckets every row by each of its bands and only compares rows that share a bucket.
+    Rows in the same group (e.g. two photos of one room) are never reported.
+    """
+    buckets = defaultdict(list)
+    for row in rows:
+        for i, band in enumerate(bands(row[2])):
+            buckets[(i, band)].append(row)
+
+    seen = set()
+    pairs = []
+    for bucket in buckets.values():
+        for n, (key_a, group_a, hash_a) in enumerate(bucket):
+            for key_b, group_b, hash_b in bucket[n + 1:]:
+                pair = (key_a, key_b) if str(key_a) < str(key_b) else (key_b, key_a)
+                if group_a == group_b or pair in seen:
+                    continue
+                seen.add(pair)
+                d = distance(hash_a, hash_b)
+                if d <= max_distance:
+                    pairs.append((d, pair[0], pair[1]))
+    return sorted(pairs, key=lambda p: p[0])
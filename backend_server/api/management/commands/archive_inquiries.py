@@ -0,0 +1,136 @@
+import gzip
+import json
+import os
+import tempfile
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import default_storage, storages
+from django.core.management.base import BaseCommand, CommandError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from api.models import TenantInquiry, LandlordInquiry
+
+
+class Command(BaseCommand):
+    help = (
+        "Moves old inquiries out of the database into gzipped JSONL files in the archive storage "
+        "(STORAGES['archives']). Rows and payment screenshots are only deleted once the upload went through."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=settings.INQUIRY_RETENTION_DAYS,
+                            help="Archive connected tenant inquiries and landlord inquiries older than this")
+        parser.add_argument('--stale-days', type=int, default=None,
+                            help="Archive tenant inquiries older than this even if never connected (default: 2 x --days)")
+        parser.add_argument('--chunk-size', type=int, default=500)
+        parser.add_argument('--prefix', default=settings.INQUIRY_ARCHIVE_PREFIX, help="Folder in the archive storage")
+        parser.add_argument('--keep-screenshots', action='store_true', help="Don't delete payment screenshots from storage")
+        parser.add_argument('--dry-run', action='store_true', help="Only count what would be archived")
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        cutoff = now - timedelta(days=options['days'])
+        stale_cutoff = now - timedelta(days=options['stale_days'] or options['days'] * 2)
+
+        tenant_qs = TenantInquiry.objects.filter(
+            Q(is_connected=True, created_at__lt=cutoff) | Q(created_at__lt=stale_cutoff)
+        )
+        landlord_qs = LandlordInquiry.objects.filter(created_at__lt=cutoff)
+
+        if options['dry_run']:
+            self.stdout.write(f"Would archive {tenant_qs.count()} tenant and {landlord_qs.count()} landlord inquiries")
+            return
+
+        stamp = now.strftime('%Y%m%d-%H%M%S')
+        tenants = self.archive(
+            tenant_qs.select_related('room'),
+            f"{options['prefix']}/tenant_inquiries-{stamp}.jsonl.gz",
+            options,
+            self.tenant_row,
+        )
+        landlords = self.archive(
+            landlord_qs,
+            f"{options['prefix']}/landlord_inquiries-{stamp}.jsonl.gz",
+            options,
+            self.landlord_row,
+        )
+
+        self.stdout.write(self.style.SUCCESS(f"Archived {tenants} tenant and {landlords} landlord inquiries"))
+
+    def archive(self, queryset, name, options, to_row):
+        """
+        Streams the queryset by primary key into a local temp file, uploads it to the archive
+        storage, and only then deletes exactly the rows that were written, chunk by chunk.
+        """
+        storage = storages['archives']
+        archived = []
+
+        with tempfile.TemporaryFile() as tmp:
+            with gzip.open(tmp, 'wt', encoding='utf-8') as archive:
+                last_pk = 0
+                while True:
+                    chunk = list(queryset.filter(pk__gt=last_pk).order_by('pk')[:options['chunk_size']])
+                    if not chunk:
+                        break
+                    last_pk = chunk[-1].pk
+                    for inquiry in chunk:
+                        archive.write(json.dumps(to_row(inquiry), cls=DjangoJSONEncoder) + "\n")
+                    archived.extend(inquiry.pk for inquiry in chunk)
+
+            if not archived:
+                return 0
+
+            tmp.seek(0)
+            saved_name = storage.save(name, File(tmp, name=os.path.basename(name)))
+
+        if not storage.exists(saved_name):
+            raise CommandError(f"{saved_name} is not in the archive storage, nothing was deleted")
+        self.stdout.write(f"  {saved_name}: {len(archived)} rows uploaded")
+
+        model = queryset.model
+        for start in range(0, len(archived), options['chunk_size']):
+            pks = archived[start:start + options['chunk_size']]
+            with transaction.atomic():
+                rows = list(model.objects.filter(pk__in=pks)) if not options['keep_screenshots'] else []
+                model.objects.filter(pk__in=pks).delete()
+            self.delete_screenshots(rows)
+
+        return len(archived)
+
+    def delete_screenshots(self, rows):
+        for inquiry in rows:
+            screenshot = getattr(inquiry, 'payment_screenshot', None)
+            if not screenshot:
+                continue
+            try:
+                default_storage.delete(screenshot.name)
+            except Exception as e:
+                self.stderr.write(f"Screenshot Delete Error ({screenshot.name}): {e}")
+
+    def tenant_row(self, inquiry):
+        # Room details are copied in, the room itself may be gone by the time anyone reads this
+        return {
+            'id': inquiry.pk,
+            'room_id': inquiry.room_id,
+            'room_title': inquiry.room.title,
+            'room_colony': inquiry.room.colony_name,
+            'name': inquiry.name,
+            'phone_number': inquiry.phone_number,
+            'payment_screenshot': inquiry.payment_screenshot.name or None,
+            'is_connected': inquiry.is_connected,
+            'created_at': inquiry.created_at,
+        }
+
+    def landlord_row(self, inquiry):
+        return {
+            'id': inquiry.pk,
+            'name': inquiry.name,
+            'phone_number': inquiry.phone_number,
+            'address': inquiry.address,
+            'created_at': inquiry.created_at,
+        }
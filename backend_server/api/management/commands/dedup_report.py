@@ -0,0 +1,53 @@
+from django.core.management.base import BaseCommand
+
+from api.dedup import duplicate_pairs, MAX_TEXT_DISTANCE, MAX_IMAGE_DISTANCE
+from api.models import Room, RoomImage
+
+
+class Command(BaseCommand):
+    help = "Lists rooms that look like duplicate listings (similar text or the same photos)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--backfill', action='store_true', help="First compute hashes missing from older rows")
+        # Above the defaults the band buckets can miss pairs
+        parser.add_argument('--text-distance', type=int, default=MAX_TEXT_DISTANCE)
+        parser.add_argument('--image-distance', type=int, default=MAX_IMAGE_DISTANCE)
+
+    def handle(self, *args, **options):
+        if options['backfill']:
+            self.backfill()
+
+        titles = dict(Room.objects.values_list('pk', 'title'))
+
+        text_rows = Room.objects.filter(text_hash__isnull=False).values_list('pk', 'pk', 'text_hash')
+        text_pairs = duplicate_pairs(text_rows, options['text_distance'])
+
+        self.stdout.write(self.style.MIGRATE_HEADING(f"Similar listings ({len(text_pairs)})"))
+        for d, a, b in text_pairs:
+            self.stdout.write(f"  [{d}] {titles[a]} ({a})  <->  {titles[b]} ({b})")
+
+        image_rows = RoomImage.objects.filter(image_hash__isnull=False).values_list('pk', 'room_id', 'image_hash')
+        image_room = {pk: room_id for pk, room_id, _ in image_rows}
+        image_pairs = duplicate_pairs(image_rows, options['image_distance'])
+
+        self.stdout.write(self.style.MIGRATE_HEADING(f"Same photos on different rooms ({len(image_pairs)})"))
+        for d, a, b in image_pairs:
+            room_a, room_b = image_room[a], image_room[b]
+            self.stdout.write(f"  [{d}] image {a} of {titles[room_a]} ({room_a})  <->  image {b} of {titles[room_b]} ({room_b})")
+
+    def backfill(self):
+        # bulk_update instead of save() so no change-feed events or alerts fire
+        rooms = list(Room.objects.filter(text_hash__isnull=True).only('pk', 'title', 'address', 'colony_name'))
+        for room in rooms:
+            room.update_text_hash()
+        Room.objects.bulk_update(
+            rooms, ['text_hash', 'text_band_0', 'text_band_1', 'text_band_2', 'text_band_3'], batch_size=200
+        )
+
+        images = list(RoomImage.objects.filter(image_hash__isnull=True))
+        for image in images:
+            image.update_image_hash()
+        RoomImage.objects.bulk_update(
+            images, ['image_hash', 'image_band_0', 'image_band_1', 'image_band_2', 'image_band_3'], batch_size=200
+        )
+        self.stdout.write(f"Backfilled {len(rooms)} room and {len(images)} image hashes")
@@ -0,0 +1,133 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from api.models import TenantInquiry, LandlordInquiry
+
+MODELS = [TenantInquiry, LandlordInquiry]
+
+
+def month_start(day):
+    return date(day.year, day.month, 1)
+
+
+def next_month(day):
+    return date(day.year + day.month // 12, day.month % 12 + 1, 1)
+
+
+class Command(BaseCommand):
+    help = (
+        "Optional, PostgreSQL only. Without flags: creates the upcoming monthly partitions (run monthly from cron). "
+        "With --convert: one-time switch of the inquiry tables to PARTITION BY RANGE (created_at)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--convert', action='store_true', help="Rebuild the inquiry tables as partitioned tables")
+        parser.add_argument('--months-ahead', type=int, default=3)
+        parser.add_argument('--keep-old', action='store_true', help="With --convert, keep the old table as <name>_unpartitioned")
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError("Partitioning is only supported on PostgreSQL")
+
+        with connection.cursor() as cursor:
+            for model in MODELS:
+                table = model._meta.db_table
+                partitioned = self.is_partitioned(cursor, table)
+
+                if options['convert'] and not partitioned:
+                    with transaction.atomic():
+                        self.convert(cursor, model, options)
+                    self.stdout.write(self.style.SUCCESS(f"{table} is now partitioned by month"))
+                elif not partitioned:
+                    self.stdout.write(f"{table} is not partitioned, skipping (use --convert)")
+                    continue
+
+                created = self.ensure_partitions(cursor, table, month_start(timezone.now().date()), options['months_ahead'])
+                self.stdout.write(f"{table}: {created} new partitions")
+
+    def is_partitioned(self, cursor, table):
+        cursor.execute(
+            "SELECT 1 FROM pg_partitioned_table p JOIN pg_class c ON c.oid = p.partrelid WHERE c.relname = %s",
+            [table],
+        )
+        return cursor.fetchone() is not None
+
+    def ensure_partitions(self, cursor, table, start, months_ahead):
+        cursor.execute("SELECT to_regclass(%s)", [f"{table}_default"])
+        has_default = cursor.fetchone()[0] is not None
+
+        months = [start]
+        for _ in range(months_ahead):
+            months.append(next_month(months[-1]))
+
+        created = 0
+        for month in months:
+            name = f"{table}_y{month:%Y}m{month:%m}"
+            bounds = [month.isoformat(), next_month(month).isoformat()]
+            cursor.execute("SELECT to_regclass(%s)", [name])
+            if cursor.fetchone()[0] is not None:
+                continue
+
+            if not has_default:
+                cursor.execute(f'CREATE TABLE "{name}" PARTITION OF "{table}" FOR VALUES FROM (%s) TO (%s)', bounds)
+            else:
+                # CREATE ... PARTITION OF fails while the default partition holds rows of this month,
+                # so build the table on its own, move those rows over, then attach it
+                with transaction.atomic():
+                    cursor.execute(f'CREATE TABLE "{name}" (LIKE "{table}" INCLUDING DEFAULTS INCLUDING CONSTRAINTS)')
+                    cursor.execute(
+                        f'WITH moved AS (DELETE FROM "{table}_default" WHERE created_at >= %s AND created_at < %s RETURNING *) '
+                        f'INSERT INTO "{name}" SELECT * FROM moved',
+                        bounds,
+                    )
+                    cursor.execute(f'ALTER TABLE "{table}" ATTACH PARTITION "{name}" FOR VALUES FROM (%s) TO (%s)', bounds)
+            created += 1
+        return created
+
+    def convert(self, cursor, model, options):
+        table = model._meta.db_table
+        old = f"{table}_unpartitioned"
+
+        cursor.execute(f'ALTER TABLE "{table}" RENAME TO "{old}"')
+
+        # Postgres needs the partition key in the primary key, ids still come from one sequence
+        cursor.execute(
+            f'CREATE TABLE "{table}" (LIKE "{old}" INCLUDING DEFAULTS INCLUDING CONSTRAINTS, '
+            f'CONSTRAINT "{table}_part_pkey" PRIMARY KEY (id, created_at)) PARTITION BY RANGE (created_at)'
+        )
+        cursor.execute(f'ALTER TABLE "{table}" ALTER COLUMN id DROP DEFAULT')
+        cursor.execute(f'CREATE SEQUENCE "{table}_id_part_seq" OWNED BY "{table}".id')
+        cursor.execute(f'ALTER TABLE "{table}" ALTER COLUMN id SET DEFAULT nextval(\'"{table}_id_part_seq"\')')
+
+        for field in model._meta.concrete_fields:
+            if field.db_index and not field.primary_key:
+                cursor.execute(f'CREATE INDEX "{table}_{field.column}_part_idx" ON "{table}" ("{field.column}")')
+            if field.is_relation:
+                related = field.related_model._meta
+                cursor.execute(
+                    f'ALTER TABLE "{table}" ADD FOREIGN KEY ("{field.column}") '
+                    f'REFERENCES "{related.db_table}" ("{related.pk.column}") DEFERRABLE INITIALLY DEFERRED'
+                )
+
+        # One partition per month of existing data, plus a default for anything out of range
+        # (rows that land there are moved into their month when ensure_partitions creates it)
+        cursor.execute(f'SELECT min(created_at) FROM "{old}"')
+        oldest = cursor.fetchone()[0]
+        start = month_start(oldest.date() if oldest else timezone.now().date())
+        this_month = month_start(timezone.now().date())
+        months = 0
+        month = start
+        while month < this_month:
+            months += 1
+            month = next_month(month)
+        self.ensure_partitions(cursor, table, start, months + options['months_ahead'])
+        cursor.execute(f'CREATE TABLE "{table}_default" PARTITION OF "{table}" DEFAULT')
+
+        cursor.execute(f'INSERT INTO "{table}" SELECT * FROM "{old}"')
+        cursor.execute(f'SELECT setval(\'"{table}_id_part_seq"\', COALESCE((SELECT max(id) FROM "{table}"), 0) + 1, false)')
+
+        if not options['keep_old']:
+            cursor.execute(f'DROP TABLE "{old}"')
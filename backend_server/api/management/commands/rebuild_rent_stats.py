@@ -0,0 +1,33 @@
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from api.models import Room, RentStat
+from api.rentstats import PriceSketch
+
+
+class Command(BaseCommand):
+    help = "Rebuilds the rent stats from scratch (first deploy, or if they ever drift)."
+
+    def handle(self, *args, **options):
+        sketches = defaultdict(PriceSketch)
+        ranges = {}  # (colony_name, room_type) -> (min price, max price)
+        rows = Room.objects.values_list('colony_name', 'room_type', 'price')
+        for colony_name, room_type, price in rows.iterator(chunk_size=2000):
+            key = (colony_name, room_type)
+            sketches[key].add(price)
+            low, high = ranges.get(key, (price, price))
+            ranges[key] = (min(low, price), max(high, price))
+
+        stats = []
+        for (colony_name, room_type), sketch in sketches.items():
+            stat = RentStat(colony_name=colony_name, room_type=room_type)
+            stat.set_from_sketch(sketch, *ranges[(colony_name, room_type)])
+            stats.append(stat)
+
+        with transaction.atomic():
+            RentStat.objects.all().delete()
+            RentStat.objects.bulk_create(stats, batch_size=500)
+
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt rent stats for {len(stats)} colony/room type groups"))
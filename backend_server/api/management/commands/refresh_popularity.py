@@ -0,0 +1,41 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db.models import Sum
+from django.utils import timezone
+
+from api.analytics import stats_buffer, VIEW_WEIGHT, INQUIRY_WEIGHT
+from api.models import Room, RoomStatHourly
+
+
+class Command(BaseCommand):
+    help = "Recomputes Room.popularity_score from the last N days of hourly stats (run from cron)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=30, help="Only count activity from the last N days")
+        parser.add_argument('--prune', action='store_true', help="Delete hourly stats older than the window")
+
+    def handle(self, *args, **options):
+        stats_buffer.flush()
+
+        since = timezone.now() - timedelta(days=options['days'])
+        totals = (
+            RoomStatHourly.objects.filter(hour__gte=since)
+            .values('room_id')
+            .annotate(views=Sum('views'), inquiries=Sum('inquiries'))
+        )
+
+        rooms = [
+            Room(pk=row['room_id'], popularity_score=row['views'] * VIEW_WEIGHT + row['inquiries'] * INQUIRY_WEIGHT)
+            for row in totals
+        ]
+
+        # Rooms with no recent activity fall back to zero
+        Room.objects.exclude(pk__in=[room.pk for room in rooms]).update(popularity_score=0)
+        Room.objects.bulk_update(rooms, ['popularity_score'], batch_size=500)
+
+        if options['prune']:
+            deleted, _ = RoomStatHourly.objects.filter(hour__lt=since).delete()
+            self.stdout.write(f"Pruned {deleted} old hourly rows")
+
+        self.stdout.write(self.style.SUCCESS(f"Updated popularity for {len(rooms)} rooms"))
@@ -0,0 +1,30 @@
+from concurrent.futures import wait
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from api import transcode
+from api.models import Room
+
+
+class Command(BaseCommand):
+    help = "Transcodes existing room videos to HLS (only ones not done yet, unless --all)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help="Redo videos that are already READY")
+        parser.add_argument('--failed', action='store_true', help="Only retry videos that FAILED before")
+
+    def handle(self, *args, **options):
+        rooms = Room.objects.exclude(video='').exclude(video__isnull=True)
+        if options['failed']:
+            rooms = rooms.filter(video_status='FAILED')
+        elif not options['all']:
+            rooms = rooms.exclude(video_status='READY')
+
+        room_ids = list(rooms.values_list('pk', flat=True))
+        self.stdout.write(f"Transcoding {len(room_ids)} videos with {settings.VIDEO_TRANSCODE_WORKERS} workers")
+
+        wait([future for future in map(transcode.enqueue, room_ids) if future is not None])
+
+        done = Room.objects.filter(pk__in=room_ids, video_status='READY').count()
+        self.stdout.write(self.style.SUCCESS(f"{done} ready, {len(room_ids) - done} failed"))
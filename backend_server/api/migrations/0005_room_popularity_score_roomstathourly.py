@@ -0,0 +1,33 @@
+# Generated by Django 6.0.2 on 2026-10-19 19:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0004_alter_room_place_name'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='room',
+            name='popularity_score',
+            field=models.FloatField(db_index=True, default=0, editable=False),
+        ),
+        migrations.CreateModel(
+            name='RoomStatHourly',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hour', models.DateTimeField(db_index=True)),
+                ('views', models.PositiveIntegerField(default=0)),
+                ('inquiries', models.PositiveIntegerField(default=0)),
+                ('room', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='hourly_stats', to='api.room')),
+            ],
+            options={
+                'verbose_name_plural': 'Room hourly stats',
+                'constraints': [models.UniqueConstraint(fields=('room', 'hour'), name='unique_room_stat_hour')],
+            },
+        ),
+    ]
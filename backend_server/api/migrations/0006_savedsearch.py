@@ -0,0 +1,31 @@
+# Generated by Django 6.0.2 on 2026-10-19 19:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_room_popularity_score_roomstathourly'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SavedSearch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('phone_number', models.CharField(db_index=True, max_length=15)),
+                ('colony_name', models.CharField(blank=True, default='', help_text='Leave empty for any colony', max_length=100)),
+                ('room_type', models.CharField(blank=True, choices=[('1_RK', '1 Room Set'), ('2_RK', '2 Room Set'), ('1_BHK', '1 BHK'), ('2_BHK', '2 BHK')], default='', max_length=50)),
+                ('tenant_type', models.CharField(blank=True, choices=[('BOYS', 'Boys Only'), ('GIRLS', 'Girls Only'), ('FAMILY', 'Family Only'), ('ANY', 'Anyone (Boys/Girls/Family)')], default='', max_length=10)),
+                ('min_price', models.IntegerField(blank=True, null=True)),
+                ('max_price', models.IntegerField(blank=True, null=True)),
+                ('is_active', models.BooleanField(default=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True, db_index=True)),
+            ],
+            options={
+                'verbose_name_plural': 'Saved searches',
+            },
+        ),
+    ]
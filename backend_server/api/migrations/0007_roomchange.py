@@ -0,0 +1,24 @@
+# Generated by Django 6.0.2 on 2026-10-19 19:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_savedsearch'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RoomChange',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('room_id', models.UUIDField(db_index=True)),
+                ('kind', models.CharField(choices=[('CREATED', 'Created'), ('UPDATED', 'Updated'), ('DELETED', 'Deleted')], max_length=10)),
+                ('is_available', models.BooleanField()),
+                ('price', models.IntegerField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 6.0.2 on 2026-10-19 19:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_roomchange'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='landlordinquiry',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True, db_index=True),
+        ),
+        migrations.AlterField(
+            model_name='tenantinquiry',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True, db_index=True),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 6.0.2 on 2026-10-19 19:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0009_duplicate_hashes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='room',
+            name='video_duration',
+            field=models.FloatField(blank=True, editable=False, help_text='Seconds', null=True),
+        ),
+        migrations.AddField(
+            model_name='room',
+            name='video_hls',
+            field=models.FileField(blank=True, editable=False, null=True, upload_to='room_videos/hls/'),
+        ),
+        migrations.AddField(
+            model_name='room',
+            name='video_poster',
+            field=models.ImageField(blank=True, editable=False, null=True, upload_to='room_videos/hls/'),
+        ),
+        migrations.AddField(
+            model_name='room',
+            name='video_status',
+            field=models.CharField(blank=True, choices=[('PENDING', 'Pending'), ('PROCESSING', 'Processing'), ('READY', 'Ready'), ('FAILED', 'Failed')], default='', editable=False, max_length=10),
+        ),
+    ]
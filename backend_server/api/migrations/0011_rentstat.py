@@ -0,0 +1,85 @@
+# Generated by Django 6.0.2 on 2026-10-19 19:08
+
+import math
+
+from django.db import migrations, models
+
+
+# Frozen copy of the bucket maths in api/rentstats.py, so later changes there can't alter this migration
+GAMMA = 1.01 / 0.99
+LOG_GAMMA = math.log(GAMMA)
+
+
+def bucket(price):
+    return 0 if price <= 1 else math.ceil(math.log(price) / LOG_GAMMA)
+
+
+def bucket_value(index):
+    return 1 if index == 0 else round(2 * GAMMA ** index / (GAMMA + 1))
+
+
+def quantile(counts, q):
+    rank = q * (sum(counts.values()) - 1)
+    seen = 0
+    for index in sorted(counts):
+        seen += counts[index]
+        if seen > rank:
+            return bucket_value(index)
+    return bucket_value(max(counts))
+
+
+def build_rent_stats(apps, schema_editor):
+    Room = apps.get_model('api', 'Room')
+    RentStat = apps.get_model('api', 'RentStat')
+
+    groups = {}
+    for colony_name, room_type, price in Room.objects.values_list('colony_name', 'room_type', 'price'):
+        groups.setdefault((colony_name, room_type), []).append(price)
+
+    for (colony_name, room_type), prices in groups.items():
+        counts = {}
+        for price in prices:
+            counts[bucket(price)] = counts.get(bucket(price), 0) + 1
+
+        RentStat.objects.create(
+            colony_name=colony_name,
+            room_type=room_type,
+            count=len(prices),
+            min_price=min(prices),
+            p25=quantile(counts, 0.25),
+            median=quantile(counts, 0.5),
+            p75=quantile(counts, 0.75),
+            max_price=max(prices),
+            histogram={str(index): n for index, n in counts.items()},
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0010_room_video_hls'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RentStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('colony_name', models.CharField(max_length=100)),
+                ('room_type', models.CharField(choices=[('1_RK', '1 Room Set'), ('2_RK', '2 Room Set'), ('1_BHK', '1 BHK'), ('2_BHK', '2 BHK')], max_length=50)),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('min_price', models.IntegerField(null=True)),
+                ('p25', models.IntegerField(null=True)),
+                ('median', models.IntegerField(null=True)),
+                ('p75', models.IntegerField(null=True)),
+                ('max_price', models.IntegerField(null=True)),
+                ('histogram', models.JSONField(default=dict)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['colony_name', 'room_type'],
+                'constraints': [models.UniqueConstraint(fields=('colony_name', 'room_type'), name='unique_rent_stat_group')],
+            },
+        ),
+        migrations.RunPython(build_rent_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 6.0.2 on 2026-10-19 19:27
+
+import api.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0011_rentstat'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='room',
+            name='video_hls',
+            field=models.FileField(blank=True, editable=False, null=True, storage=api.models.hls_storage, upload_to='room_videos/hls/'),
+        ),
+    ]
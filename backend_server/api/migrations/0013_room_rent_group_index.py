@@ -0,0 +1,17 @@
+# Generated by Django 6.0.2 on 2026-10-19 19:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0012_video_hls_storage'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='room',
+            index=models.Index(fields=['colony_name', 'room_type', 'price'], name='room_rent_group_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 6.0.2 on 2026-10-19 19:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0013_room_rent_group_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='savedsearch',
+            name='last_alerted_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+    ]
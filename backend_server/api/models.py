@@ -1,6 +1,14 @@
+from django.core.files.storage import storages
 from django.db import models
 import uuid
 
+from .alerts import whatsapp_number
+from .dedup import text_simhash, image_dhash, bands
+
+
+def hls_storage():
+    return storages['hls']
+
 
 class Colony(models.Model):
     name = models.CharField(max_length=100, unique=True)
@@ -43,6 +51,18 @@ class Room(models.Model):
     is_available = models.BooleanField(default=True)
     video = models.FileField(upload_to='room_videos/', blank=True, null=True)
 
+    # Filled in by api/transcode.py after upload (adaptive HLS for mobile data)
+    VIDEO_STATUS_CHOICES = [
+        ('PENDING', 'Pending'),
+        ('PROCESSING', 'Processing'),
+        ('READY', 'Ready'),
+        ('FAILED', 'Failed'),
+    ]
+    video_hls = models.FileField(upload_to='room_videos/hls/', storage=hls_storage, blank=True, null=True, editable=False)
+    video_poster = models.ImageField(upload_to='room_videos/hls/', blank=True, null=True, editable=False)
+    video_duration = models.FloatField(blank=True, null=True, editable=False, help_text="Seconds")
+    video_status = models.CharField(max_length=10, choices=VIDEO_STATUS_CHOICES, blank=True, default="", editable=False)
+
     google_map_link = models.URLField(blank=True, null=True, help_text="Google Maps link here")
     total_inventory = models.IntegerField(default=1, help_text="How many sets of this room are available?")
     
@@ -67,26 +87,88 @@ class Room(models.Model):
         help_text="Who is this room for?"
     )
 
+    # Precomputed from RoomStatHourly (views + inquiries), used for ordering=popularity
+    popularity_score = models.FloatField(default=0, db_index=True, editable=False)
+
+    # Simhash of title/address/colony + its 16-bit bands, for finding duplicate listings (see api/dedup.py)
+    text_hash = models.BigIntegerField(null=True, blank=True, editable=False)
+    text_band_0 = models.IntegerField(null=True, blank=True, editable=False, db_index=True)
+    text_band_1 = models.IntegerField(null=True, blank=True, editable=False, db_index=True)
+    text_band_2 = models.IntegerField(null=True, blank=True, editable=False, db_index=True)
+    text_band_3 = models.IntegerField(null=True, blank=True, editable=False, db_index=True)
+
     created_at = models.DateTimeField(auto_now_add=True)
 
     def __str__(self):
         return f"{self.title} ({self.colony_name})"
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember what was loaded so signals can tell what changed on save
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+
+    def update_text_hash(self):
+        self.text_hash = text_simhash(self.title, self.address, self.colony_name)
+        for i, band in enumerate(bands(self.text_hash) if self.text_hash is not None else [None] * 4):
+            setattr(self, f"text_band_{i}", band)
+
     def save(self, *args, **kwargs):
         if self.total_inventory <= 0:
             self.is_available = False
         else:
             self.is_available = True 
+
+        self.update_text_hash()
         super().save(*args, **kwargs)
+        self._loaded_values = {}
+        for field in self._meta.concrete_fields:
+            value = getattr(self, field.attname)
+            # By name, like from_db: the FieldFile itself is shared and changes in place on room.video.save()
+            if isinstance(field, models.FileField):
+                value = value.name
+            self._loaded_values[field.attname] = value
+
+    class Meta:
+        indexes = [
+            # Exact cheapest/dearest rent per group for RentStat, read straight off the index
+            models.Index(fields=['colony_name', 'room_type', 'price'], name='room_rent_group_idx'),
+        ]
 
 
 class RoomImage(models.Model):
     room = models.ForeignKey(Room, related_name='images', on_delete=models.CASCADE)
     image = models.ImageField(upload_to='room_images/')
+
+    # dHash of the picture + its 16-bit bands, same WhatsApp photo under another name ends up here too
+    image_hash = models.BigIntegerField(null=True, blank=True, editable=False)
+    image_band_0 = models.IntegerField(null=True, blank=True, editable=False, db_index=True)
+    image_band_1 = models.IntegerField(null=True, blank=True, editable=False, db_index=True)
+    image_band_2 = models.IntegerField(null=True, blank=True, editable=False, db_index=True)
+    image_band_3 = models.IntegerField(null=True, blank=True, editable=False, db_index=True)
     
     def __str__(self):
         return f"Image for {self.room.title}"
 
+    def update_image_hash(self):
+        try:
+            self.image.open()
+            self.image_hash = image_dhash(self.image)
+            self.image.seek(0)
+        except Exception as e:
+            print(f"Image Hash Error ({self.image.name}): {e}")
+            self.image_hash = None
+
+        for i, band in enumerate(bands(self.image_hash) if self.image_hash is not None else [None] * 4):
+            setattr(self, f"image_band_{i}", band)
+
+    def save(self, *args, **kwargs):
+        # Only hash fresh uploads here, already stored files are done by `dedup_report --backfill`
+        if self.image and not self.image._committed:
+            self.update_image_hash()
+        super().save(*args, **kwargs)
+
 class TenantInquiry(models.Model):
     room = models.ForeignKey(Room, on_delete=models.CASCADE)
     name = models.CharField(max_length=100)
@@ -95,7 +177,7 @@ class TenantInquiry(models.Model):
     # The Screenshot Field
     payment_screenshot = models.ImageField(upload_to='payment_proofs/', blank=True, null=True)
     
-    created_at = models.DateTimeField(auto_now_add=True)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
     is_connected = models.BooleanField(default=False)
 
     def __str__(self):
@@ -105,7 +187,108 @@ class LandlordInquiry(models.Model):
     name = models.CharField(max_length=100)
     phone_number = models.CharField(max_length=15)
     address = models.TextField()
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    def __str__(self):
+        return f"Landlord: {self.name}"
+
+
+# Hourly rollup of room views and inquiries (filled by api.analytics, never per request)
+class RoomStatHourly(models.Model):
+    room = models.ForeignKey(Room, related_name='hourly_stats', on_delete=models.CASCADE)
+    hour = models.DateTimeField(db_index=True)
+    views = models.PositiveIntegerField(default=0)
+    inquiries = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.room_id} @ {self.hour:%Y-%m-%d %H:00}"
+
+    class Meta:
+        verbose_name_plural = "Room hourly stats"
+        constraints = [
+            models.UniqueConstraint(fields=['room', 'hour'], name='unique_room_stat_hour'),
+        ]
+
+
+# A tenant waiting for a matching room (empty fields / prices mean "any")
+class SavedSearch(models.Model):
+    phone_number = models.CharField(max_length=15, db_index=True)
+    colony_name = models.CharField(max_length=100, blank=True, default="", help_text="Leave empty for any colony")
+    room_type = models.CharField(max_length=50, choices=Room.ROOM_TYPE_CHOICES, blank=True, default="")
+    tenant_type = models.CharField(max_length=10, choices=Room.TENANT_CHOICES, blank=True, default="")
+    min_price = models.IntegerField(null=True, blank=True)
+    max_price = models.IntegerField(null=True, blank=True)
+    is_active = models.BooleanField(default=True)
+    # Set by api.alerts when a message goes out, the per-phone rate limit reads it back
+    last_alerted_at = models.DateTimeField(null=True, blank=True, editable=False)
+
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
 
     def __str__(self):
-        return f"Landlord: {self.name}"
\ No newline at end of file
+        return f"Alert for {self.phone_number} ({self.colony_name or 'Any colony'})"
+
+    def save(self, *args, **kwargs):
+        # Stored the way WhatsApp sends it (91XXXXXXXXXX), so one phone is always one value
+        self.phone_number = whatsapp_number(self.phone_number)
+        super().save(*args, **kwargs)
+
+    class Meta:
+        verbose_name_plural = "Saved searches"
+
+
+# Append-only log of room availability/price changes, clients catch up with ?since=<id>
+class RoomChange(models.Model):
+    KIND_CHOICES = [
+        ('CREATED', 'Created'),
+        ('UPDATED', 'Updated'),
+        ('DELETED', 'Deleted'),
+    ]
+
+    id = models.BigAutoField(primary_key=True)
+    # Not a ForeignKey, the event has to outlive a deleted room
+    room_id = models.UUIDField(db_index=True)
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    is_available = models.BooleanField()
+    price = models.IntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"#{self.id} {self.kind} {self.room_id}"
+
+
+# Rent numbers per (colony, room type), kept up to date by the Room signals (see api/rentstats.py)
+class RentStat(models.Model):
+    colony_name = models.CharField(max_length=100)
+    room_type = models.CharField(max_length=50, choices=Room.ROOM_TYPE_CHOICES)
+
+    # Precomputed on every write: count, min and max are exact, the quartiles come
+    # from the histogram and are within 1% of the real prices
+    count = models.PositiveIntegerField(default=0)
+    min_price = models.IntegerField(null=True)
+    p25 = models.IntegerField(null=True)
+    median = models.IntegerField(null=True)
+    p75 = models.IntegerField(null=True)
+    max_price = models.IntegerField(null=True)
+
+    histogram = models.JSONField(default=dict)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.colony_name} / {self.room_type}: {self.count} rooms"
+
+    def set_from_sketch(self, sketch, min_price, max_price):
+        self.histogram = sketch.to_json()
+        self.count = sketch.count
+        # Bucket midpoints aren't prices anyone asked for, so the ends come from the rooms themselves
+        self.min_price = min_price
+        self.p25 = sketch.quantile(0.25)
+        self.median = sketch.quantile(0.5)
+        self.p75 = sketch.quantile(0.75)
+        self.max_price = max_price
+
+    class Meta:
+        ordering = ['colony_name', 'room_type']
+        constraints = [
+            models.UniqueConstraint(fields=['colony_name', 'room_type'], name='unique_rent_stat_group'),
+        ]
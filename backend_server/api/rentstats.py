@@ -0,0 +1,85 @@
+import math
+
+from django.db import transaction
+from django.db.models import Max, Min
+
+# Bucket edges grow by ~2%, so every quantile is within 1% of the real price
+RELATIVE_ACCURACY = 0.01
+GAMMA = (1 + RELATIVE_ACCURACY) / (1 - RELATIVE_ACCURACY)
+LOG_GAMMA = math.log(GAMMA)
+
+
+class PriceSketch:
+    """
+    Log-bucketed price histogram (same idea as DDSketch). Rooms can be added and removed,
+    and two sketches merge by adding their counts, so nothing ever needs the full price list.
+    """
+
+    def __init__(self, counts=None):
+        # JSON keys come back as strings
+        self.counts = {int(bucket): n for bucket, n in (counts or {}).items()}
+
+    @staticmethod
+    def bucket(price):
+        return 0 if price <= 1 else math.ceil(math.log(price) / LOG_GAMMA)
+
+    @staticmethod
+    def value(bucket):
+        if bucket == 0:
+            return 1
+        return round(2 * GAMMA ** bucket / (GAMMA + 1))
+
+    @property
+    def count(self):
+        return sum(self.counts.values())
+
+    def add(self, price):
+        bucket = self.bucket(price)
+        self.counts[bucket] = self.counts.get(bucket, 0) + 1
+
+    def remove(self, price):
+        bucket = self.bucket(price)
+        if self.counts.get(bucket, 0) > 1:
+            self.counts[bucket] -= 1
+        else:
+            self.counts.pop(bucket, None)
+
+    def quantile(self, q):
+        if not self.counts:
+            return None
+        rank = q * (self.count - 1)
+        seen = 0
+        for bucket in sorted(self.counts):
+            seen += self.counts[bucket]
+            if seen > rank:
+                return self.value(bucket)
+        return self.value(max(self.counts))
+
+    def to_json(self):
+        return {str(bucket): n for bucket, n in self.counts.items()}
+
+
+def update_rent_stat(colony_name, room_type, add=None, remove=None):
+    """
+    Applies one room's price change to its (colony, room_type) row and refreshes the precomputed numbers.
+    Runs from the Room signals, after the room itself is already saved or deleted.
+    """
+    from .models import Room, RentStat
+
+    with transaction.atomic():
+        stat, _ = RentStat.objects.select_for_update().get_or_create(colony_name=colony_name, room_type=room_type)
+        sketch = PriceSketch(stat.histogram)
+        if remove is not None:
+            sketch.remove(remove)
+        if add is not None:
+            sketch.add(add)
+
+        if not sketch.counts:
+            stat.delete()
+            return
+        # Two index lookups on (colony_name, room_type, price), not a scan of the group
+        prices = Room.objects.filter(colony_name=colony_name, room_type=room_type).aggregate(
+            low=Min('price'), high=Max('price')
+        )
+        stat.set_from_sketch(sketch, prices['low'], prices['high'])
+        stat.save()
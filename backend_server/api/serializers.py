@@ -1,5 +1,6 @@
 from rest_framework import serializers
-from .models import Room, RoomImage, TenantInquiry, LandlordInquiry, Colony
+from .alerts import MAX_SEARCHES_PER_PHONE, is_indian_mobile, whatsapp_number
+from .models import Room, RoomImage, TenantInquiry, LandlordInquiry, Colony, SavedSearch, RoomChange, RentStat
 
 class ColonySerializer(serializers.ModelSerializer):
     class Meta:
@@ -21,7 +22,8 @@ class RoomSerializer(serializers.ModelSerializer):
         'id', 'title', 'price', 'description', 'address', 
         'colony_name', 'images', 'video', 'room_type', 
         'is_available', 'tenant_type', 
-        'place_name', 'distance_km'
+        'place_name', 'distance_km',
+        'video_hls', 'video_poster', 'video_duration'
     ]
 class TenantInquirySerializer(serializers.ModelSerializer):
     class Meta:
@@ -31,4 +33,33 @@ class TenantInquirySerializer(serializers.ModelSerializer):
 class LandlordInquirySerializer(serializers.ModelSerializer):
     class Meta:
         model = LandlordInquiry
-        fields = ['name', 'phone_number', 'address']
\ No newline at end of file
+        fields = ['name', 'phone_number', 'address']
+
+class SavedSearchSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = SavedSearch
+        fields = ['id', 'phone_number', 'colony_name', 'room_type', 'tenant_type', 'min_price', 'max_price']
+
+    def validate_phone_number(self, value):
+        number = whatsapp_number(value)
+        if not is_indian_mobile(number):
+            raise serializers.ValidationError("Enter a 10 digit Indian mobile number")
+        return number
+
+    def validate(self, data):
+        min_price, max_price = data.get('min_price'), data.get('max_price')
+        if min_price is not None and max_price is not None and min_price > max_price:
+            raise serializers.ValidationError("min_price can't be more than max_price")
+        if SavedSearch.objects.filter(phone_number=data['phone_number'], is_active=True).count() >= MAX_SEARCHES_PER_PHONE:
+            raise serializers.ValidationError(f"A number can have at most {MAX_SEARCHES_PER_PHONE} active alerts")
+        return data
+
+class RoomChangeSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = RoomChange
+        fields = ['id', 'room_id', 'kind', 'is_available', 'price', 'created_at']
+
+class RentStatSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = RentStat
+        fields = ['colony_name', 'room_type', 'count', 'min_price', 'p25', 'median', 'p75', 'max_price']
@@ -0,0 +1,83 @@
+import threading
+
+from django.db import connection, transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .alerts import notify_matching_searches
+from . import transcode
+from .suggest import suggest_index
+from .rentstats import update_rent_stat
+from .models import Room, RoomChange, Colony
+
+
+# Any constant, only has to be the same for every writer of the change feed
+ROOM_CHANGE_LOCK = 7_300_001
+
+
+def record_room_change(**fields):
+    """
+    Writes a RoomChange only after the room's own transaction commits, one writer at a time.
+    Feed readers page with id > since, which is only safe if ids become visible in id order -
+    a plain insert inside a long transaction could commit after a newer id was already read.
+    """
+    def write():
+        with transaction.atomic():
+            if connection.vendor == 'postgresql':
+                # Held until commit, so the next insert can't take a sequence value before this one is visible
+                with connection.cursor() as cursor:
+                    cursor.execute("SELECT pg_advisory_xact_lock(%s)", [ROOM_CHANGE_LOCK])
+            RoomChange.objects.create(**fields)
+
+    transaction.on_commit(write, robust=True)
+
+
+@receiver(post_save, sender=Room)
+def room_saved(sender, instance, created, **kwargs):
+    loaded = getattr(instance, '_loaded_values', {})
+    was_available = loaded.get('is_available', False)
+
+    # Feed for /api/rooms/changes/, only what the room list actually shows changing
+    if created or was_available != instance.is_available or loaded.get('price') != instance.price:
+        record_room_change(
+            room_id=instance.pk,
+            kind='CREATED' if created else 'UPDATED',
+            is_available=instance.is_available,
+            price=instance.price,
+        )
+
+    # Move this room's price between the (colony, room_type) rent sketches
+    rent_fields = ('colony_name', 'room_type', 'price')
+    if created:
+        update_rent_stat(instance.colony_name, instance.room_type, add=instance.price)
+    elif all(field in loaded for field in rent_fields) and any(loaded[field] != getattr(instance, field) for field in rent_fields):
+        if (loaded['colony_name'], loaded['room_type']) == (instance.colony_name, instance.room_type):
+            update_rent_stat(instance.colony_name, instance.room_type, add=instance.price, remove=loaded['price'])
+        else:
+            update_rent_stat(loaded['colony_name'], loaded['room_type'], remove=loaded['price'])
+            update_rent_stat(instance.colony_name, instance.room_type, add=instance.price)
+
+    # Typeahead only cares about names and which rooms are available
+    if created or any(loaded.get(field) != getattr(instance, field) for field in ('colony_name', 'place_name', 'is_available')):
+        transaction.on_commit(suggest_index.mark_stale)
+
+    # New, replaced or removed video: old HLS outputs are cleared and the new video is transcoded
+    if (created or 'video' in loaded) and (loaded.get('video') or '') != (instance.video.name or ''):
+        transaction.on_commit(lambda: transcode.enqueue(instance.pk))
+
+    # Alert tenants when a room is new, or comes back after being rented out
+    if instance.is_available and (created or not was_available):
+        transaction.on_commit(lambda: threading.Thread(target=notify_matching_searches, args=(instance,)).start())
+
+
+@receiver(post_delete, sender=Room)
+def room_deleted(sender, instance, **kwargs):
+    record_room_change(room_id=instance.pk, kind='DELETED', is_available=False, price=instance.price)
+    update_rent_stat(instance.colony_name, instance.room_type, remove=instance.price)
+    transaction.on_commit(suggest_index.mark_stale)
+
+
+@receiver(post_save, sender=Colony)
+@receiver(post_delete, sender=Colony)
+def colony_changed(sender, **kwargs):
+    transaction.on_commit(suggest_index.mark_stale)
@@ -0,0 +1,127 @@
+import re
+import threading
+import time
+
+from django.conf import settings
+from django.db.models import Count
+
+# How many suggestions are kept per trie node (the most a request can ask for)
+MAX_SUGGESTIONS = 10
+
+
+def normalize(text):
+    return re.sub(r"\s+", " ", (text or "").strip().lower())
+
+
+class TrieNode:
+    __slots__ = ('children', 'entries', 'top')
+
+    def __init__(self):
+        self.children = {}
+        self.entries = set()
+        self.top = []
+
+
+class SuggestIndex:
+    """
+    Prefix trie over colony and place names, weighted by how many available rooms they have.
+    Every node keeps its own precomputed top suggestions, so a lookup is just walking the
+    typed characters - no sorting and no database at request time.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._root = None
+        self._built_at = 0
+        self._stale = False
+        self._rebuilding = False
+
+    def suggest(self, query, limit=MAX_SUGGESTIONS):
+        if self._root is None:
+            # Only the very first request after startup builds synchronously
+            with self._lock:
+                if self._root is None:
+                    self._root = self.build()
+                    self._built_at = time.monotonic()
+        elif time.monotonic() - self._built_at > settings.SUGGEST_REFRESH_SECONDS:
+            # Picks up changes made through other worker processes
+            self.mark_stale()
+
+        node = self._root
+        for char in normalize(query):
+            node = node.children.get(char)
+            if node is None:
+                return []
+        return node.top[:limit]
+
+    def mark_stale(self):
+        """Called from the catalog signals, rebuilds in the background while the old trie keeps serving."""
+        with self._lock:
+            # Not built yet, the first request will build it fresh anyway
+            if self._root is None:
+                return
+            self._stale = True
+            if self._rebuilding:
+                return
+            self._rebuilding = True
+        threading.Thread(target=self._rebuild).start()
+
+    def _rebuild(self):
+        try:
+            while True:
+                with self._lock:
+                    if not self._stale:
+                        self._rebuilding = False
+                        return
+                    self._stale = False
+                root = self.build()
+                self._root, self._built_at = root, time.monotonic()
+        except Exception as e:
+            print(f"Suggest Index Error: {e}")
+            with self._lock:
+                self._rebuilding = False
+
+    def build(self):
+        from .models import Room, Colony
+
+        available = Room.objects.filter(is_available=True)
+        entries = {}  # normalized name -> {'name', 'kind', 'rooms'}
+
+        def add(name, kind, rooms):
+            key = normalize(name)
+            if not key:
+                return
+            entry = entries.setdefault(key, {'name': name.strip(), 'kind': kind, 'rooms': 0})
+            entry['rooms'] += rooms
+            # A name that is both a colony and a landmark shows up as the colony
+            if kind == 'colony':
+                entry['kind'] = 'colony'
+
+        for name in Colony.objects.values_list('name', flat=True):
+            add(name, 'colony', 0)
+        for row in available.values('colony_name').annotate(rooms=Count('pk')):
+            add(row['colony_name'], 'colony', row['rooms'])
+        for row in available.exclude(place_name__isnull=True).values('place_name').annotate(rooms=Count('pk')):
+            add(row['place_name'], 'place', row['rooms'])
+
+        root = TrieNode()
+        for key, entry in entries.items():
+            # Index from the start of every word, so "mandir" finds "Shiv Mandir"
+            for start in [0] + [m.end() for m in re.finditer(r" ", key)]:
+                node = root
+                for char in key[start:]:
+                    node = node.children.setdefault(char, TrieNode())
+                    node.entries.add(key)
+
+        stack = [root]
+        while stack:
+            node = stack.pop()
+            ranked = sorted(node.entries, key=lambda key: (-entries[key]['rooms'], key))
+            node.top = [entries[key] for key in ranked[:MAX_SUGGESTIONS]]
+            node.entries = None
+            stack.extend(node.children.values())
+
+        return root
+
+
+suggest_index = SuggestIndex()
@@ -1,3 +1,976 @@
-from django.test import TestCase
+import gzip
+import io
+import json
+import math
+import random
+import re
+import threading
+import uuid
+from datetime import timedelta
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage, storages
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import IntegrityError, connection, transaction
+from django.test import AsyncClient, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image, ImageOps
+from rest_framework.test import APIClient
+
+from .alerts import IntervalTree, SavedSearchIndex, AlertOutbox, MAX_ROOMS_PER_MESSAGE, MAX_SEARCHES_PER_PHONE
+from .analytics import StatsBuffer, stats_buffer, current_hour
+from .dedup import (
+    BANDS, HASH_BITS, MAX_IMAGE_DISTANCE, bands, distance, duplicate_pairs, image_dhash, similar_images, text_simhash,
+    to_signed,
+)
+from .rentstats import PriceSketch, RELATIVE_ACCURACY
+from .transcode import transcode_room_video
+from .models import (
+    Colony, Room, RoomImage, TenantInquiry, LandlordInquiry, RoomStatHourly, SavedSearch, RoomChange, RentStat,
+)
+from .suggest import suggest_index
+
+# Catalog sizes every endpoint is measured at, the query count must not change between them
+SIZES = (1, 5, 25)
+
+COLONIES = ['Rajpur', 'Model Town', 'Shiv Nagar']
+
+# No Cloudinary uploads and no collectstatic manifest needed to run the tests
+TEST_STORAGES = {
+    "default": {"BACKEND": "django.core.files.storage.InMemoryStorage"},
+    "staticfiles": {"BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"},
+    "hls": {"BACKEND": "django.core.files.storage.InMemoryStorage"},
+    "archives": {"BACKEND": "django.core.files.storage.InMemoryStorage"},
+}
+
+
+class CatalogMixin:
+    """Grows the catalog step by step: rooms with photos, inquiries, stats and saved searches."""
+
+    def grow_catalog(self, size):
+        existing = Room.objects.count()
+        for i in range(existing, size):
+            colony = COLONIES[i % len(COLONIES)]
+            if not Colony.objects.filter(name=colony).exists():
+                Colony.objects.create(name=colony)
+
+            room = Room.objects.create(
+                title=f"Room {i}",
+                price=4000 + 250 * i,
+                address=f"House {i}, Gali {i % 7}",
+                colony_name=colony,
+                room_type=Room.ROOM_TYPE_CHOICES[i % 4][0],
+                tenant_type=Room.TENANT_CHOICES[i % 4][0],
+                place_name=f"Landmark {i % 5}",
+            )
+            # The signal only writes the event once a real transaction commits
+            RoomChange.objects.create(room_id=room.pk, kind='CREATED', is_available=True, price=room.price)
+            # Already "stored" names, so nothing is read or hashed from disk
+            RoomImage.objects.create(room=room, image=f"room_images/room_{i}_a.jpg")
+            RoomImage.objects.create(room=room, image=f"room_images/room_{i}_b.jpg")
+
+            TenantInquiry.objects.create(room=room, name=f"Tenant {i}", phone_number=f"98{i:08d}")
+            LandlordInquiry.objects.create(name=f"Landlord {i}", phone_number=f"97{i:08d}", address=colony)
+            RoomStatHourly.objects.create(room=room, hour=current_hour(), views=i, inquiries=1)
+            SavedSearch.objects.create(phone_number=f"96{i:08d}", colony_name=colony, max_price=9000)
+
+
+@override_settings(STORAGES=TEST_STORAGES)
+class QueryCountTests(CatalogMixin, TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        self.admin = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        # Inquiry views email from a background thread, not wanted in tests
+        thread_patcher = mock.patch('api.views.threading.Thread')
+        thread_patcher.start()
+        self.addCleanup(thread_patcher.stop)
+
+    def tearDown(self):
+        # Write buffered view counts now, while the test database still exists
+        stats_buffer.flush()
+
+    def assertConstantQueries(self, request, expected_status=200):
+        counts = []
+        for size in SIZES:
+            self.grow_catalog(size)
+            with CaptureQueriesContext(connection) as queries:
+                response = request()
+            self.assertEqual(response.status_code, expected_status, getattr(response, 'data', response))
+            counts.append(len(queries))
+
+        self.assertEqual(
+            len(set(counts)), 1,
+            f"Query count grows with the catalog {dict(zip(SIZES, counts))}:\n"
+            + "\n".join(query['sql'] for query in queries.captured_queries),
+        )
+        return counts[0]
+
+    # --- Public API ---
+
+    def test_room_list(self):
+        self.assertConstantQueries(lambda: self.client.get('/api/rooms/'))
+
+    def test_room_list_filtered_and_ordered(self):
+        self.assertConstantQueries(
+            lambda: self.client.get('/api/rooms/', {'room_type': '1_RK', 'ordering': 'popularity', 'search': 'Room'})
+        )
+
+    def test_room_list_most_popular_first(self):
+        self.grow_catalog(SIZES[-1])
+        scores = random.Random(5).sample(range(1000), Room.objects.count())
+        for room, score in zip(Room.objects.all(), scores):
+            Room.objects.filter(pk=room.pk).update(popularity_score=score)
+
+        response = self.client.get('/api/rooms/', {'ordering': 'popularity'})
+        ids = [room['id'] for room in response.data]
+        expected = [str(pk) for pk in Room.objects.order_by('-popularity_score').values_list('pk', flat=True)]
+        self.assertEqual(ids, expected)
+
+        response = self.client.get('/api/rooms/', {'ordering': '-popularity'})
+        self.assertEqual([room['id'] for room in response.data], expected[::-1])
+
+    def test_room_detail(self):
+        self.assertConstantQueries(lambda: self.client.get(f"/api/rooms/{Room.objects.last().pk}/"))
+
+    def test_room_changes(self):
+        self.assertConstantQueries(lambda: self.client.get('/api/rooms/changes/', {'since': 0}))
+
+    def test_colonies(self):
+        self.assertConstantQueries(lambda: self.client.get('/api/colonies/'))
+
+    def test_rent_stats(self):
+        self.assertConstantQueries(lambda: self.client.get('/api/stats/rent/'))
+
+    def test_suggest_never_hits_the_database(self):
+        self.grow_catalog(SIZES[-1])
+        suggest_index._root = None
+        self.client.get('/api/suggest/', {'q': 'raj'})
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/suggest/', {'q': 'raj'})
+        self.assertEqual(response.data[0]['name'], 'Rajpur')
+        self.assertEqual(len(queries), 0)
+
+    def test_suggest_limit_is_clamped(self):
+        self.grow_catalog(SIZES[-1])
+        suggest_index._root = None
+        # "landmark 0".."landmark 4" all start with "l"
+        for limit, expected in (('-3', 1), ('0', 1), ('2', 2), ('999', 5), ('abc', 5)):
+            response = self.client.get('/api/suggest/', {'q': 'l', 'limit': limit})
+            self.assertEqual(len(response.data), expected, limit)
+
+    def test_tenant_inquiry_create(self):
+        self.assertConstantQueries(
+            lambda: self.client.post(
+                '/api/inquire/tenant/',
+                {'room': Room.objects.last().pk, 'name': 'Tenant', 'phone_number': '9876543210'},
+            ),
+            expected_status=201,
+        )
+
+    def test_landlord_inquiry_create(self):
+        self.assertConstantQueries(
+            lambda: self.client.post(
+                '/api/inquire/landlord/', {'name': 'Owner', 'phone_number': '9876543210', 'address': 'Rajpur'}
+            ),
+            expected_status=201,
+        )
+
+    def test_saved_search_create(self):
+        self.assertConstantQueries(
+            lambda: self.client.post('/api/saved-searches/', {'phone_number': '9876543210', 'max_price': 6000}),
+            expected_status=201,
+        )
+
+    # --- Admin changelists ---
+
+    def assertConstantChangelist(self, model_name):
+        self.client.force_login(self.admin)
+        self.assertConstantQueries(lambda: self.client.get(reverse(f"admin:api_{model_name}_changelist")))
+
+    def test_admin_room_changelist(self):
+        self.assertConstantChangelist('room')
+
+    def test_admin_tenant_inquiry_changelist(self):
+        self.assertConstantChangelist('tenantinquiry')
+
+    def test_admin_landlord_inquiry_changelist(self):
+        self.assertConstantChangelist('landlordinquiry')
+
+    def test_admin_colony_changelist(self):
+        self.assertConstantChangelist('colony')
+
+    def test_admin_room_stat_changelist(self):
+        self.assertConstantChangelist('roomstathourly')
+
+    def test_admin_saved_search_changelist(self):
+        self.assertConstantChangelist('savedsearch')
+
+    def test_admin_rent_stat_changelist(self):
+        self.assertConstantChangelist('rentstat')
+
+
+@override_settings(STORAGES=TEST_STORAGES)
+class IndexUsageTests(CatalogMixin, TestCase):
+    """EXPLAIN the filters the API and background jobs rely on, and make sure an index is used."""
+
+    @classmethod
+    def setUpTestData(cls):
+        CatalogMixin().grow_catalog(SIZES[-1])
+
+    def assertUsesIndex(self, queryset):
+        if connection.vendor == 'sqlite':
+            plan = queryset.explain()
+            self.assertRegex(plan, r"USING (COVERING )?INDEX|USING INTEGER PRIMARY KEY", plan)
+        elif connection.vendor == 'postgresql':
+            # Tiny test tables would always get a seq scan, so ask whether an index *can* serve it
+            with transaction.atomic(), connection.cursor() as cursor:
+                cursor.execute("SET LOCAL enable_seqscan = off")
+                plan = queryset.explain()
+            self.assertTrue(re.search(r"Index (Only )?Scan|Bitmap Index Scan", plan), plan)
+        else:
+            self.skipTest(f"No EXPLAIN check for {connection.vendor}")
+
+    def test_room_filters(self):
+        self.assertUsesIndex(Room.objects.filter(room_type='1_BHK'))
+        self.assertUsesIndex(Room.objects.filter(colony_name='Rajpur'))
+        self.assertUsesIndex(Room.objects.filter(tenant_type='BOYS'))
+        self.assertUsesIndex(Room.objects.filter(price__lte=6000))
+
+    def test_room_popularity_ordering(self):
+        self.assertUsesIndex(Room.objects.order_by('-popularity_score')[:20])
+
+    def test_room_duplicate_band_lookup(self):
+        room = Room.objects.first()
+        self.assertUsesIndex(Room.objects.filter(text_band_2=room.text_band_2))
+
+    def test_room_changes_since(self):
+        self.assertUsesIndex(RoomChange.objects.filter(id__gt=10).order_by('id'))
+
+    def test_room_stat_rollup_lookup(self):
+        room = Room.objects.first()
+        self.assertUsesIndex(RoomStatHourly.objects.filter(room=room, hour=current_hour()))
+
+    def test_inquiry_archive_cutoff(self):
+        cutoff = timezone.now() - timedelta(days=180)
+        self.assertUsesIndex(TenantInquiry.objects.filter(created_at__lt=cutoff))
+        self.assertUsesIndex(LandlordInquiry.objects.filter(created_at__lt=cutoff))
+
+    def test_rent_stat_group_lookup(self):
+        self.assertUsesIndex(RentStat.objects.filter(colony_name='Rajpur', room_type='1_BHK'))
+
+    def test_rent_group_price_range(self):
+        self.assertUsesIndex(Room.objects.filter(colony_name='Rajpur', room_type='1_BHK').order_by('price').values('price')[:1])
+
+
+@override_settings(STORAGES=TEST_STORAGES)
+class StatsBufferTests(CatalogMixin, TestCase):
+
+    def setUp(self):
+        self.buffer = StatsBuffer()
+        # No timer thread, flush() is called by hand
+        self.buffer._worker = object()
+
+    def record(self, rooms):
+        for room in rooms:
+            self.buffer.record_view(room.pk)
+            self.buffer.record_view(room.pk)
+            self.buffer.record_inquiry(room.pk)
+
+    def test_flush_query_count_is_constant(self):
+        counts = []
+        for size in SIZES:
+            self.grow_catalog(size)
+            self.record(Room.objects.all())
+            with CaptureQueriesContext(connection) as queries:
+                self.buffer.flush()
+            counts.append(len(queries))
+        self.assertEqual(len(set(counts)), 1, dict(zip(SIZES, counts)))
+
+    @override_settings(ANALYTICS_MAX_BUFFER=3)
+    def test_full_buffer_wakes_the_worker(self):
+        threads = threading.active_count()
+        with mock.patch.object(self.buffer, 'flush') as flush:
+            for _ in range(10):
+                self.buffer.record_view(uuid.uuid4())
+        # No flush in the request thread and no thread per event, just a nudge to the one worker
+        flush.assert_not_called()
+        self.assertEqual(threading.active_count(), threads)
+        self.assertTrue(self.buffer._wake.is_set())
+
+    @override_settings(ANALYTICS_MAX_BUFFER=3)
+    def test_no_wake_while_a_flush_is_running(self):
+        with self.buffer._flushing:
+            for _ in range(10):
+                self.buffer.record_view(uuid.uuid4())
+        self.assertFalse(self.buffer._wake.is_set())
+
+    def stat_counts(self):
+        return {
+            (stat.room_id, stat.hour): (stat.views, stat.inquiries)
+            for stat in RoomStatHourly.objects.filter(hour=current_hour())
+        }
+
+    def test_failed_flush_keeps_counts(self):
+        self.grow_catalog(2)
+        rooms = list(Room.objects.all())
+        before = self.stat_counts()
+        self.record(rooms)
+
+        with mock.patch('api.models.RoomStatHourly.objects.bulk_create', side_effect=RuntimeError("db down")):
+            self.assertEqual(self.buffer.flush(), 0)
+        self.assertEqual(self.stat_counts(), before)
+
+        self.assertEqual(self.buffer.flush(), 2)
+        after = self.stat_counts()
+        for room in rooms:
+            key = (room.pk, current_hour())
+            self.assertEqual((after[key][0] - before[key][0], after[key][1] - before[key][1]), (2, 1))
+            self.assertEqual(Room.objects.get(pk=room.pk).popularity_score, room.popularity_score + 12.0)
+
+
+class SavedSearchIndexTests(TestCase):
+
+    def setUp(self):
+        self.index = SavedSearchIndex()
+        self.labels = {}  # stored phone number -> name used in the test
+
+    def search(self, label, **fields):
+        search = SavedSearch.objects.create(phone_number=f"98765{len(self.labels):05d}", **fields)
+        self.labels[search.phone_number] = label
+        return search
+
+    def match(self, room):
+        return {self.labels[phone] for phone in self.index.match(room)}
+
+    def room(self, price=5000, colony_name='Rajpur', room_type='1_RK', tenant_type='BOYS'):
+        # Unsaved, match() only reads the fields
+        return Room(title="Room", price=price, colony_name=colony_name, room_type=room_type, tenant_type=tenant_type)
+
+    def test_blank_fields_match_anything(self):
+        self.search('1')
+        self.search('2', colony_name='Rajpur')
+        self.search('3', colony_name=' rajpur ', room_type='1_RK', tenant_type='BOYS')
+        self.search('4', colony_name='Model Town')
+        self.search('5', room_type='2_BHK')
+        self.search('6', tenant_type='GIRLS')
+
+        self.assertEqual(self.match(self.room()), {'1', '2', '3'})
+        self.assertEqual(self.match(self.room(colony_name='Model Town', room_type='2_BHK')), {'1', '4', '5'})
+
+    def test_room_for_anyone_matches_every_tenant_type(self):
+        self.search('boys', tenant_type='BOYS')
+        self.search('girls', tenant_type='GIRLS')
+        self.search('family', tenant_type='FAMILY')
+        self.search('any')
+
+        self.assertEqual(self.match(self.room(tenant_type='ANY')), {'boys', 'girls', 'family', 'any'})
+        self.assertEqual(self.match(self.room(tenant_type='GIRLS')), {'girls', 'any'})
+
+    def test_price_range_edges_are_inclusive(self):
+        self.search('range', min_price=4000, max_price=6000)
+        self.search('min_only', min_price=6000)
+        self.search('max_only', max_price=4000)
+
+        self.assertEqual(self.match(self.room(price=3999)), {'max_only'})
+        self.assertEqual(self.match(self.room(price=4000)), {'range', 'max_only'})
+        self.assertEqual(self.match(self.room(price=5000)), {'range'})
+        self.assertEqual(self.match(self.room(price=6000)), {'range', 'min_only'})
+        self.assertEqual(self.match(self.room(price=6001)), {'min_only'})
+
+    def test_picks_up_new_and_stopped_searches(self):
+        first = self.search('first')
+        self.assertEqual(self.match(self.room()), {'first'})
+
+        self.search('second', max_price=9000)
+        SavedSearch.objects.filter(pk=first.pk).update(is_active=False, updated_at=timezone.now())
+        self.assertEqual(self.match(self.room()), {'second'})
+
+
+
+class CountingPrice(int):
+    """A price that counts how often it gets compared, i.e. how many ranges a lookup touched."""
+    comparisons = 0
+
+    def _count(op):
+        def compare(self, other):
+            CountingPrice.comparisons += 1
+            return getattr(int, op)(self, other)
+        return compare
+
+    __lt__, __le__, __gt__, __ge__ = _count('__lt__'), _count('__le__'), _count('__gt__'), _count('__ge__')
+
+
+class IntervalTreeTests(TestCase):
+
+    def test_stab_matches_brute_force(self):
+        rng = random.Random(3)
+        entries = []
+        for i in range(300):
+            low = rng.choice([0, rng.randrange(2000, 15000, 500)])
+            high = rng.choice([math.inf, low + rng.randrange(0, 8000, 500)])
+            entries.append((low, high, str(i)))
+        tree = IntervalTree(entries)
+
+        for price in list(range(0, 25000, 250)) + [2999, 3000, 3001]:
+            expected = sorted(phone for low, high, phone in entries if low <= price <= high)
+            self.assertEqual(sorted(phone for _, _, phone in tree.stab(price)), expected, price)
+
+    def test_only_matching_ranges_are_visited(self):
+        # The usual subscription has only a maximum: "under 3000", "under 3005", ...
+        entries = [(0, 3000 + 5 * i, str(i)) for i in range(2000)]
+        tree = IntervalTree(entries)
+
+        CountingPrice.comparisons = 0
+        matches = {phone for _, _, phone in tree.stab(CountingPrice(12950))}
+        self.assertEqual(matches, {str(i) for i in range(1990, 2000)})
+        # 10 matches plus a few misses per tree level, not a scan of all 2000
+        self.assertLess(CountingPrice.comparisons, 80)
+
+
+@override_settings(ALERT_FLUSH_SECONDS=3600, ALERT_MIN_INTERVAL_SECONDS=3600)
+class AlertOutboxTests(TestCase):
+
+    def setUp(self):
+        self.outbox = AlertOutbox()
+        # No timer thread, flush() is called by hand
+        self.outbox._worker = object()
+        for phone in ('9876543210', '9123456789'):
+            SavedSearch.objects.create(phone_number=phone)
+        self.now = timezone.now()
+        clock = mock.patch('api.alerts.timezone.now', side_effect=lambda: self.now)
+        whatsapp = mock.patch('api.views.send_simple_whatsapp')
+        clock.start()
+        self.send = whatsapp.start()
+        self.addCleanup(clock.stop)
+        self.addCleanup(whatsapp.stop)
+
+    def room(self, i):
+        return Room(title=f"Room {i}", price=5000 + i, colony_name='Rajpur')
+
+    def test_rooms_for_one_phone_are_batched(self):
+        for i in range(MAX_ROOMS_PER_MESSAGE + 2):
+            self.outbox.queue('9876543210', self.room(i))
+
+        self.assertEqual(self.outbox.flush(), 1)
+        phone, text = self.send.call_args.args
+        self.assertEqual(phone, '919876543210')
+        self.assertEqual(text.count('• '), MAX_ROOMS_PER_MESSAGE)
+        self.assertIn('...and 2 more', text)
+
+    def test_recipient_is_rate_limited(self):
+        self.outbox.queue('9876543210', self.room(1))
+        self.assertEqual(self.outbox.flush(), 1)
+
+        # Within the interval the new room waits, other recipients are unaffected
+        self.now += timedelta(seconds=60)
+        self.outbox.queue('9876543210', self.room(2))
+        self.outbox.queue('9123456789', self.room(3))
+        self.assertEqual(self.outbox.flush(), 1)
+        self.assertEqual(self.send.call_args.args[0], '919123456789')
+
+        self.now += timedelta(seconds=3600)
+        self.outbox.queue('9876543210', self.room(4))
+        self.assertEqual(self.outbox.flush(), 1)
+        phone, text = self.send.call_args.args
+        self.assertEqual(phone, '919876543210')
+        self.assertIn('Room 2', text)
+        self.assertIn('Room 4', text)
+        self.assertEqual(self.send.call_count, 3)
+
+    def test_rate_limit_survives_a_restart(self):
+        self.outbox.queue('9876543210', self.room(1))
+        self.assertEqual(self.outbox.flush(), 1)
+
+        # Another worker process, or this one after a deploy
+        other = AlertOutbox()
+        other._worker = object()
+        self.now += timedelta(seconds=60)
+        other.queue('9876543210', self.room(2))
+        self.assertEqual(other.flush(), 0)
+        self.assertEqual(self.send.call_count, 1)
+
+    def test_nothing_queued_sends_nothing(self):
+        self.assertEqual(self.outbox.flush(), 0)
+        self.send.assert_not_called()
+
+
+class SavedSearchEndpointTests(TestCase):
+
+    def create(self, phone, **fields):
+        return self.client.post('/api/saved-searches/', {'phone_number': phone, **fields})
+
+    def test_phone_number_is_validated_and_normalized(self):
+        for bad in ('12345', 'not a phone', '0123456789', '+1 415 555 0100', '91234567890123'):
+            self.assertEqual(self.create(bad).status_code, 400, bad)
+
+        response = self.create('+91 98765-43210', max_price=6000)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['phone_number'], '919876543210')
+
+    def test_active_searches_per_phone_are_capped(self):
+        for i in range(MAX_SEARCHES_PER_PHONE):
+            self.assertEqual(self.create('9876543210', max_price=5000 + i).status_code, 201)
+        # Written differently, still the same phone
+        self.assertEqual(self.create('+919876543210').status_code, 400)
+
+        SavedSearch.objects.filter(phone_number='919876543210').update(is_active=False)
+        self.assertEqual(self.create('9876543210').status_code, 201)
+
+
+class RoomChangeFeedTests(TestCase):
+
+    def setUp(self):
+        # Only the change-feed callbacks matter here, not the alert and typeahead threads
+        for target in ('api.signals.notify_matching_searches', 'api.signals.suggest_index'):
+            patcher = mock.patch(target)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def create_room(self, **fields):
+        return Room.objects.create(title="Room", price=5000, address="House 1", colony_name='Rajpur', **fields)
+
+    def test_event_is_written_after_commit(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            room = self.create_room()
+            # Not visible to ?since= readers while the room's transaction is still open
+            self.assertFalse(RoomChange.objects.filter(room_id=room.pk).exists())
+
+        with CaptureQueriesContext(connection) as queries:
+            for callback in callbacks:
+                callback()
+        change = RoomChange.objects.get(room_id=room.pk)
+        self.assertEqual((change.kind, change.price), ('CREATED', 5000))
+
+        if connection.vendor == 'postgresql':
+            sql = [query['sql'] for query in queries.captured_queries]
+            lock = next(i for i, q in enumerate(sql) if 'pg_advisory_xact_lock' in q)
+            insert = next(i for i, q in enumerate(sql) if q.startswith('INSERT INTO "api_roomchange"'))
+            self.assertLess(lock, insert)
+
+    def test_events_keep_commit_order(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            first = self.create_room()
+        with self.captureOnCommitCallbacks(execute=True):
+            second = self.create_room()
+        with self.captureOnCommitCallbacks(execute=True):
+            first.price = 4500
+            first.save()
+
+        response = self.client.get('/api/rooms/changes/', {'since': 0})
+        changes = [(c['room_id'], c['price']) for c in response.json()['changes']]
+        self.assertEqual(changes, [(str(first.pk), 5000), (str(second.pk), 5000), (str(first.pk), 4500)])
+
+    def test_rolled_back_room_writes_no_event(self):
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            with self.assertRaises(IntegrityError), transaction.atomic():
+                self.create_room()
+                raise IntegrityError("rolled back")
+        self.assertEqual(callbacks, [])
+        self.assertFalse(RoomChange.objects.exists())
+
+    def test_stream_needs_asgi(self):
+        response = self.client.get('/api/rooms/changes/stream/')
+        self.assertEqual(response.status_code, 501)
+        self.assertIn('?since=', response.json()['detail'])
+
+    @override_settings(ROOM_CHANGES_STREAM_SECONDS=0, ROOM_CHANGES_POLL_SECONDS=0)
+    async def test_stream_ends_after_its_time_limit(self):
+        change = await RoomChange.objects.acreate(room_id=uuid.uuid4(), kind='CREATED', is_available=True, price=5000)
+
+        response = await AsyncClient().get('/api/rooms/changes/stream/', {'since': change.id - 1})
+        self.assertEqual(response.status_code, 200)
+        body = b"".join([chunk async for chunk in response.streaming_content]).decode()
+        self.assertIn(f"id: {change.id}\n", body)
+
+
+def make_photo(size=(240, 160), fmt='JPEG', mirror=False):
+    """Generated 'photo' with some structure: a diagonal gradient with a dark block."""
+    image = Image.new('L', size)
+    width, height = size
+    image.putdata([(x * 255 // width + y * 128 // height) % 256 for y in range(height) for x in range(width)])
+    image.paste(0, (width // 5, height // 4, width // 2, height * 3 // 4))
+    if mirror:
+        image = ImageOps.mirror(image)
+    buffer = io.BytesIO()
+    image.convert('RGB').save(buffer, fmt)
+    buffer.seek(0)
+    return buffer
+
+
+@override_settings(STORAGES=TEST_STORAGES)
+class DedupTests(TestCase):
+
+    def flip(self, value, bits):
+        for bit in bits:
+            value ^= 1 << bit
+        return to_signed(value & ((1 << HASH_BITS) - 1))
+
+    def test_close_hashes_always_share_a_band(self):
+        rng = random.Random(7)
+        for _ in range(500):
+            value = to_signed(rng.getrandbits(HASH_BITS))
+            other = self.flip(value, rng.sample(range(HASH_BITS), rng.randint(0, BANDS - 1)))
+            self.assertLessEqual(distance(value, other), MAX_IMAGE_DISTANCE)
+            self.assertTrue(set(enumerate(bands(value))) & set(enumerate(bands(other))))
+            self.assertEqual(len(duplicate_pairs([('a', 1, value), ('b', 2, other)], MAX_IMAGE_DISTANCE)), 1)
+
+        # One flipped bit per band: distance 4 and nothing in common, why the limit is 3
+        spread = self.flip(0, [0, 16, 32, 48])
+        self.assertEqual(distance(0, spread), 4)
+        self.assertFalse(set(enumerate(bands(0))) & set(enumerate(bands(spread))))
+
+    def test_duplicate_pairs_skips_same_group_and_far_hashes(self):
+        value = to_signed(0x1234_5678_9ABC_DEF0)
+        rows = [
+            ('a', 'room1', value),
+            ('b', 'room1', self.flip(value, [1])),
+            ('c', 'room2', self.flip(value, [2, 40])),
+            ('d', 'room3', ~value),
+        ]
+        self.assertEqual(duplicate_pairs(rows, 3), [(2, 'a', 'c'), (3, 'b', 'c')])
+
+    def test_text_simhash(self):
+        a = text_simhash("Spacious 1 RK near Shiv Mandir", "House 12, Gali-4", "Rajpur")
+        b = text_simhash("SPACIOUS 1 rk, near  shiv mandir", "house 12 gali 4", "rajpur")
+        c = text_simhash("2 BHK family flat", "Plot 88, Sector 9", "Model Town")
+        self.assertEqual(distance(a, b), 0)
+        self.assertGreater(distance(a, c), MAX_IMAGE_DISTANCE)
+        self.assertIsNone(text_simhash("", None, " - "))
+
+    def test_image_dhash_ignores_size_and_format(self):
+        original = image_dhash(make_photo())
+        self.assertLessEqual(distance(original, image_dhash(make_photo(size=(960, 640), fmt='PNG'))), 3)
+        self.assertGreater(distance(original, image_dhash(make_photo(mirror=True))), 10)
+
+    def create_room_with_photo(self, title, photo):
+        room = Room.objects.create(title=title, price=5000, address="House 12, Gali 4", colony_name='Rajpur')
+        image = RoomImage.objects.create(room=room, image=SimpleUploadedFile('photo.jpg', photo.read()))
+        return room, image
+
+    def test_same_photo_on_two_rooms(self):
+        room_a, image_a = self.create_room_with_photo("Room near market", make_photo())
+        room_b, image_b = self.create_room_with_photo("Room near market", make_photo(size=(480, 320)))
+        self.create_room_with_photo("Other room", make_photo(mirror=True))
+
+        self.assertIsNotNone(image_a.image_hash)
+        self.assertEqual([other for _, other in similar_images(image_a)], [image_b])
+
+        out = io.StringIO()
+        call_command('dedup_report', stdout=out)
+        report = out.getvalue()
+        self.assertIn("Similar listings (1)", report)
+        self.assertIn("Same photos on different rooms (1)", report)
+        self.assertIn(str(room_a.pk), report)
+        self.assertIn(str(room_b.pk), report)
+
+
+@override_settings(STORAGES=TEST_STORAGES)
+class VideoOutputTests(TestCase):
+
+    def setUp(self):
+        patcher = mock.patch('api.transcode.executor')
+        self.executor = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def transcoded_room(self):
+        """Room whose video has already been turned into HLS."""
+        room = Room.objects.create(
+            title="Room", price=5000, address="House 1", colony_name='Rajpur',
+            video=SimpleUploadedFile('tour.mp4', b'old video'),
+        )
+        prefix = f"room_videos/hls/{room.pk}"
+        master = storages['hls'].save(f"{prefix}/master.m3u8", ContentFile(b"#EXTM3U\n"))
+        storages['hls'].save(f"{prefix}/360p/segment_000.ts", ContentFile(b"ts"))
+        poster = default_storage.save(f"{prefix}/poster.jpg", ContentFile(b"jpg"))
+        Room.objects.filter(pk=room.pk).update(
+            video_hls=master, video_poster=poster, video_duration=12.5, video_status='READY'
+        )
+        return Room.objects.get(pk=room.pk), master, poster
+
+    def run_transcode_job(self):
+        job, *args = self.executor.submit.call_args.args
+        with mock.patch('api.transcode.probe', side_effect=RuntimeError("no ffmpeg in tests")):
+            job(*args)
+
+    def test_removing_the_video_clears_outputs(self):
+        room, master, poster = self.transcoded_room()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            room.video = None
+            room.save()
+
+        room.refresh_from_db()
+        self.assertEqual((room.video_hls.name, room.video_poster.name, room.video_duration, room.video_status), ('', '', None, ''))
+
+        self.run_transcode_job()
+        self.assertFalse(storages['hls'].exists(master))
+        self.assertFalse(storages['hls'].exists(f"room_videos/hls/{room.pk}/360p/segment_000.ts"))
+        self.assertFalse(default_storage.exists(poster))
+        room.refresh_from_db()
+        self.assertEqual(room.video_status, '')
+
+    def test_replacing_the_video_requeues_it(self):
+        room, master, poster = self.transcoded_room()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            room.video = SimpleUploadedFile('tour2.mp4', b'new video')
+            room.save()
+
+        room.refresh_from_db()
+        self.assertEqual((room.video_hls.name, room.video_poster.name, room.video_status), ('', '', 'PENDING'))
+
+        # The new video fails here (no ffmpeg), but the old stream is gone either way
+        self.run_transcode_job()
+        self.assertFalse(storages['hls'].exists(master))
+        room.refresh_from_db()
+        self.assertEqual(room.video_status, 'FAILED')
+
+    def test_other_edits_leave_the_video_alone(self):
+        room, master, poster = self.transcoded_room()
+        self.executor.reset_mock()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            room.price = 5500
+            room.save()
+
+        self.executor.submit.assert_not_called()
+        room.refresh_from_db()
+        self.assertEqual(room.video_status, 'READY')
+
+
+    def test_video_saved_through_the_field_file(self):
+        room = Room.objects.create(title="Room", price=5000, address="House 1", colony_name='Rajpur')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            room.video.save('tour.mp4', ContentFile(b'video'))
+        self.assertEqual(self.executor.submit.call_count, 1)
+
+        # Same instance again, replacing the file in place
+        with self.captureOnCommitCallbacks(execute=True):
+            room.video.save('tour2.mp4', ContentFile(b'new video'))
+        self.assertEqual(self.executor.submit.call_count, 2)
+        self.assertEqual(Room.objects.get(pk=room.pk).video_status, 'PENDING')
+
+    def fake_ffmpeg(self, *args):
+        """Stands in for ffmpeg: writes the files each call would produce."""
+        self.ffmpeg_calls.append(args)
+        if '-hls_segment_filename' in args:
+            playlist = Path(args[-1])
+            (playlist.parent / 'segment_000.ts').write_bytes(b'ts')
+            playlist.write_text("#EXTM3U\n#EXTINF:6.0,\nsegment_000.ts\n#EXT-X-ENDLIST\n")
+        else:
+            Path(args[-1]).write_bytes(b'jpg')
+
+    def transcode_new_video(self):
+        room = Room.objects.create(
+            title="Room", price=5000, address="House 1", colony_name='Rajpur',
+            video=SimpleUploadedFile('tour.mp4', b'video'),
+        )
+        self.ffmpeg_calls = []
+        with mock.patch('api.transcode.probe', return_value=(12.34, 1280, 720)), \
+                mock.patch('api.transcode.run', side_effect=self.fake_ffmpeg):
+            transcode_room_video(room.pk)
+        room.refresh_from_db()
+        return room
+
+    def test_transcode_writes_master_playlist(self):
+        room = self.transcode_new_video()
+        self.assertEqual((room.video_status, room.video_duration), ('READY', 12.3))
+        self.assertTrue(default_storage.exists(room.video_poster.name))
+
+        master = storages['hls'].open(room.video_hls.name).read().decode()
+        self.assertEqual(master.count('#EXT-X-STREAM-INF'), 3)
+        self.assertIn('RESOLUTION=1280x720', master)
+        rendition = storages['hls'].open(f"room_videos/hls/{room.pk}/720p/index.m3u8").read().decode()
+        self.assertIn(storages['hls'].url(f"room_videos/hls/{room.pk}/720p/segment_000.ts"), rendition)
+
+    def test_renditions_are_8_bit_420(self):
+        self.transcode_new_video()
+        renditions = [args for args in self.ffmpeg_calls if '-hls_segment_filename' in args]
+        self.assertEqual(len(renditions), 3)
+        for args in renditions:
+            self.assertEqual(args[args.index('-pix_fmt') + 1], 'yuv420p')
+
+class PriceSketchTests(TestCase):
+
+    def test_quantiles_within_relative_accuracy(self):
+        prices = [2500 + 37 * i for i in range(400)] + [15000, 18000, 22000]
+        sketch = PriceSketch()
+        for price in prices:
+            sketch.add(price)
+
+        ordered = sorted(prices)
+        self.assertEqual(sketch.count, len(prices))
+        for q in (0, 0.1, 0.25, 0.5, 0.75, 0.9, 1):
+            real = ordered[int(q * (len(ordered) - 1))]
+            self.assertLessEqual(abs(sketch.quantile(q) - real), real * RELATIVE_ACCURACY + 1, q)
+
+    def test_remove_undoes_add(self):
+        sketch = PriceSketch()
+        for price in (3000, 3000, 5000, 9000):
+            sketch.add(price)
+        sketch.remove(9000)
+        sketch.remove(3000)
+        # Removing a price that was never added changes nothing
+        sketch.remove(123456)
+
+        expected = PriceSketch()
+        expected.add(3000)
+        expected.add(5000)
+        self.assertEqual(sketch.counts, expected.counts)
+
+        sketch.remove(3000)
+        sketch.remove(5000)
+        self.assertEqual((sketch.count, sketch.quantile(0.5)), (0, None))
+
+    def test_json_round_trip(self):
+        sketch = PriceSketch()
+        for price in (0, 1, 4200, 4300, 12000):
+            sketch.add(price)
+        self.assertEqual(PriceSketch(sketch.to_json()).counts, sketch.counts)
+
+
+class RentStatTests(TestCase):
+
+    def create_room(self, price, room_type='1_RK'):
+        return Room.objects.create(
+            title="Room", price=price, address="House 1", colony_name='Rajpur', room_type=room_type
+        )
+
+    def stat(self):
+        return self.client.get('/api/stats/rent/', {'colony_name': 'Rajpur', 'room_type': '1_RK'}).json()[0]
+
+    def test_min_and_max_are_real_prices(self):
+        rooms = [self.create_room(price) for price in (3000, 3000, 5000, 9000)]
+        stat = self.stat()
+        self.assertEqual((stat['count'], stat['min_price'], stat['max_price']), (4, 3000, 9000))
+
+        rooms[3].delete()
+        self.assertEqual(self.stat()['max_price'], 5000)
+
+        rooms[0].price = 2800
+        rooms[0].save()
+        self.assertEqual((self.stat()['min_price'], self.stat()['max_price']), (2800, 5000))
+
+        # Moving to another room type takes the price out of this group
+        rooms[2].room_type = '2_BHK'
+        rooms[2].save()
+        stat = self.stat()
+        self.assertEqual((stat['count'], stat['min_price'], stat['max_price']), (2, 2800, 3000))
+
+    def test_rebuild_matches_incremental(self):
+        for price in (3000, 3000, 5000, 9000):
+            self.create_room(price)
+        before = self.stat()
+
+        call_command('rebuild_rent_stats', stdout=io.StringIO())
+        after = self.stat()
+        for field in ('count', 'min_price', 'p25', 'median', 'p75', 'max_price'):
+            self.assertEqual(after[field], before[field], field)
+
+
+@override_settings(INQUIRY_RETENTION_DAYS=180)
+class ArchiveInquiriesTests(TestCase):
+
+    def setUp(self):
+        # Fresh in-memory storages per test, archives from earlier tests would show up otherwise
+        self.enterContext(override_settings(STORAGES=TEST_STORAGES))
+        self.room = Room.objects.create(title="Room", price=5000, address="House 1", colony_name='Rajpur')
+
+    def tenant(self, days_old, is_connected=False, screenshot=None):
+        inquiry = TenantInquiry.objects.create(
+            room=self.room, name="Tenant", phone_number="9876543210", is_connected=is_connected,
+            payment_screenshot=screenshot and SimpleUploadedFile(screenshot, b'jpg'),
+        )
+        # auto_now_add, so age it afterwards
+        TenantInquiry.objects.filter(pk=inquiry.pk).update(created_at=timezone.now() - timedelta(days=days_old))
+        return TenantInquiry.objects.get(pk=inquiry.pk)
+
+    def landlord(self, days_old):
+        inquiry = LandlordInquiry.objects.create(name="Owner", phone_number="9876543210", address="Rajpur")
+        LandlordInquiry.objects.filter(pk=inquiry.pk).update(created_at=timezone.now() - timedelta(days=days_old))
+        return inquiry
+
+    def archive(self, *args):
+        out = io.StringIO()
+        call_command('archive_inquiries', *args, stdout=out, stderr=out)
+        return out.getvalue()
+
+    def archived_rows(self, kind):
+        storage = storages['archives']
+        if not storage.exists('archives/inquiries'):
+            return []
+        _, files = storage.listdir('archives/inquiries')
+        rows = []
+        for name in files:
+            if name.startswith(kind):
+                with storage.open(f"archives/inquiries/{name}") as f:
+                    rows += [json.loads(line) for line in gzip.decompress(f.read()).decode().splitlines()]
+        return rows
+
+    def test_connected_and_stale_cutoffs(self):
+        connected_old = self.tenant(200, is_connected=True)
+        connected_new = self.tenant(100, is_connected=True)
+        waiting = self.tenant(200)
+        stale = self.tenant(400)
+        landlord_old, landlord_new = self.landlord(200), self.landlord(10)
+
+        self.archive()
+
+        self.assertEqual(set(TenantInquiry.objects.values_list('pk', flat=True)), {connected_new.pk, waiting.pk})
+        self.assertEqual(list(LandlordInquiry.objects.values_list('pk', flat=True)), [landlord_new.pk])
+        self.assertEqual({row['id'] for row in self.archived_rows('tenant')}, {connected_old.pk, stale.pk})
+        self.assertEqual([row['id'] for row in self.archived_rows('landlord')], [landlord_old.pk])
+        self.assertEqual(self.archived_rows('tenant')[0]['room_title'], "Room")
+
+    def test_deletes_in_chunks(self):
+        for _ in range(5):
+            self.tenant(400)
+
+        with CaptureQueriesContext(connection) as queries:
+            self.archive('--chunk-size', '2')
+
+        deletes = [q['sql'] for q in queries.captured_queries if q['sql'].startswith('DELETE FROM "api_tenantinquiry"')]
+        self.assertEqual(len(deletes), 3)
+        self.assertFalse(TenantInquiry.objects.exists())
+        self.assertEqual(len(self.archived_rows('tenant')), 5)
+
+    def test_screenshots_are_pruned(self):
+        screenshot = self.tenant(400, screenshot='proof.jpg').payment_screenshot.name
+        self.assertTrue(default_storage.exists(screenshot))
+
+        self.archive()
+        self.assertFalse(default_storage.exists(screenshot))
+        self.assertEqual(self.archived_rows('tenant')[0]['payment_screenshot'], screenshot)
+
+    def test_keep_screenshots(self):
+        screenshot = self.tenant(400, screenshot='proof.jpg').payment_screenshot.name
+
+        self.archive('--keep-screenshots')
+        self.assertFalse(TenantInquiry.objects.exists())
+        self.assertTrue(default_storage.exists(screenshot))
+
+    def test_dry_run_changes_nothing(self):
+        self.tenant(400)
+        self.landlord(200)
+
+        self.assertIn("Would archive 1 tenant and 1 landlord inquiries", self.archive('--dry-run'))
+        self.assertEqual((TenantInquiry.objects.count(), LandlordInquiry.objects.count()), (1, 1))
+        self.assertEqual(self.archived_rows('tenant'), [])
+
+    def test_failed_upload_deletes_nothing(self):
+        screenshot = self.tenant(400, screenshot='proof.jpg').payment_screenshot.name
+
+        with mock.patch.object(storages['archives'], 'save', side_effect=OSError("upload failed")):
+            with self.assertRaises(OSError):
+                self.archive()
+        self.assertEqual(TenantInquiry.objects.count(), 1)
+        self.assertTrue(default_storage.exists(screenshot))
@@ -0,0 +1,179 @@
+import json
+import os
+import shutil
+import subprocess
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import default_storage, storages
+
+# (name, height, video bitrate, audio bitrate) - renditions taller than the source are skipped
+RENDITIONS = [
+    ('360p', 360, '800k', '96k'),
+    ('480p', 480, '1400k', '128k'),
+    ('720p', 720, '2800k', '128k'),
+]
+SEGMENT_SECONDS = 6
+
+executor = ThreadPoolExecutor(max_workers=settings.VIDEO_TRANSCODE_WORKERS, thread_name_prefix='transcode')
+
+
+def enqueue(room_id):
+    """
+    Called whenever the room's video is set, replaced or removed: clears the previous
+    outputs right away (so the old stream is never served for a new video) and hands
+    the room to the worker pool.
+    """
+    from .models import Room
+
+    room = Room.objects.filter(pk=room_id).values('video', 'video_poster').first()
+    if room is None:
+        return None
+
+    Room.objects.filter(pk=room_id).update(
+        video_hls='',
+        video_poster='',
+        video_duration=None,
+        video_status='PENDING' if room['video'] else '',
+    )
+    return executor.submit(transcode_room_video, room_id, room['video_poster'])
+
+
+def delete_outputs(room_id, poster_name=None):
+    """Deletes the playlists and segments of an earlier transcode, plus its poster."""
+    storage = storages['hls']
+
+    def walk(path):
+        try:
+            directories, files = storage.listdir(path)
+        except FileNotFoundError:
+            return
+        for name in files:
+            storage.delete(f"{path}/{name}")
+        for name in directories:
+            walk(f"{path}/{name}")
+
+    try:
+        walk(f"room_videos/hls/{room_id}")
+        if poster_name:
+            default_storage.delete(poster_name)
+    except Exception as e:
+        print(f"Transcode Cleanup Error ({room_id}): {e}")
+
+
+def run(*args):
+    return subprocess.run(args, check=True, capture_output=True, text=True, timeout=settings.VIDEO_TRANSCODE_TIMEOUT)
+
+
+def probe(path):
+    """Returns (duration in seconds, width, height) using ffprobe."""
+    result = run(
+        settings.FFPROBE_BINARY, '-v', 'error', '-select_streams', 'v:0',
+        '-show_entries', 'stream=width,height:format=duration', '-of', 'json', str(path),
+    )
+    info = json.loads(result.stdout)
+    stream = info['streams'][0]
+    return float(info['format']['duration']), int(stream['width']), int(stream['height'])
+
+
+def transcode_room_video(room_id, old_poster=None):
+    from .models import Room
+
+    delete_outputs(room_id, old_poster)
+
+    room = Room.objects.filter(pk=room_id).first()
+    if room is None or not room.video:
+        return
+
+    source_name = room.video.name
+    Room.objects.filter(pk=room_id).update(video_status='PROCESSING')
+    workdir = Path(tempfile.mkdtemp(prefix='transcode-'))
+
+    try:
+        # Local copy first, ffmpeg needs to seek and the file may live on Cloudinary/S3
+        source = workdir / ('source' + os.path.splitext(source_name)[1])
+        with room.video.open('rb') as remote, open(source, 'wb') as local:
+            for chunk in remote.chunks():
+                local.write(chunk)
+
+        duration, width, height = probe(source)
+        renditions = [r for r in RENDITIONS if r[1] <= height] or RENDITIONS[:1]
+
+        for name, rendition_height, video_rate, audio_rate in renditions:
+            out = workdir / name
+            out.mkdir()
+            run(
+                settings.FFMPEG_BINARY, '-y', '-i', str(source),
+                '-vf', f'scale=-2:{rendition_height}',
+                # 8-bit 4:2:0 is what the main profile and HLS players take, 10-bit HDR/4:4:4 sources get converted
+                '-c:v', 'libx264', '-preset', 'veryfast', '-profile:v', 'main', '-pix_fmt', 'yuv420p',
+                '-b:v', video_rate, '-maxrate', video_rate, '-bufsize', video_rate,
+                '-c:a', 'aac', '-b:a', audio_rate, '-ac', '2',
+                # Keyframe at every segment boundary so players can switch renditions cleanly
+                '-force_key_frames', f'expr:gte(t,n_forced*{SEGMENT_SECONDS})',
+                '-f', 'hls', '-hls_time', str(SEGMENT_SECONDS), '-hls_playlist_type', 'vod',
+                '-hls_segment_filename', str(out / 'segment_%03d.ts'),
+                str(out / 'index.m3u8'),
+            )
+
+        poster = workdir / 'poster.jpg'
+        run(
+            settings.FFMPEG_BINARY, '-y', '-ss', str(min(1.0, duration / 2)), '-i', str(source),
+            '-frames:v', '1', '-q:v', '3', str(poster),
+        )
+
+        prefix = f"room_videos/hls/{room_id}"
+        master = ['#EXTM3U', '#EXT-X-VERSION:3']
+        for name, rendition_height, video_rate, audio_rate in renditions:
+            playlist_url = upload_rendition(workdir / name, f"{prefix}/{name}")
+            bandwidth = (int(video_rate[:-1]) + int(audio_rate[:-1])) * 1000
+            # Same maths as scale=-2:<height>, keeps the aspect ratio and an even width
+            scaled_width = round(width * rendition_height / height / 2) * 2
+            master.append(f'#EXT-X-STREAM-INF:BANDWIDTH={bandwidth},RESOLUTION={scaled_width}x{rendition_height}')
+            master.append(playlist_url)
+
+        master_name = save_text(f"{prefix}/master.m3u8", "\n".join(master) + "\n")
+        with open(poster, 'rb') as f:
+            poster_name = default_storage.save(f"{prefix}/poster.jpg", File(f))
+
+        # .update() so saving these doesn't go through the Room signals again
+        updated = Room.objects.filter(pk=room_id, video=source_name).update(
+            video_hls=master_name,
+            video_poster=poster_name,
+            video_duration=round(duration, 1),
+            video_status='READY',
+        )
+        if not updated:
+            print(f"Transcode Skipped: video of room {room_id} changed while processing")
+
+    except Exception as e:
+        print(f"Transcode Error ({room_id}): {e}")
+        Room.objects.filter(pk=room_id, video=source_name).update(video_status='FAILED')
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def upload_rendition(folder, prefix):
+    """
+    Uploads the segments, then the playlist rewritten to point at the stored segment URLs
+    (storages may rename files on save, so relative names can't be trusted).
+    """
+    lines = []
+    for line in (folder / 'index.m3u8').read_text().splitlines():
+        if line and not line.startswith('#'):
+            with open(folder / line, 'rb') as f:
+                line = storages['hls'].url(storages['hls'].save(f"{prefix}/{line}", File(f)))
+        lines.append(line)
+
+    return storages['hls'].url(save_text(f"{prefix}/index.m3u8", "\n".join(lines) + "\n"))
+
+
+def save_text(name, text):
+    with tempfile.TemporaryFile() as f:
+        f.write(text.encode())
+        f.seek(0)
+        return storages['hls'].save(name, File(f, name=os.path.basename(name)))
+
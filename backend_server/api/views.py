@@ -1,20 +1,46 @@
+import asyncio
 import json
 import requests
 import threading
+import time
 from django.core.mail import EmailMessage
 from django.conf import settings
-from django.http import HttpResponse
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.utils import timezone
 from django.views.decorators.csrf import csrf_exempt
 from rest_framework import viewsets, generics, filters
+from rest_framework.decorators import action
+from rest_framework.response import Response
+from rest_framework.views import APIView
 from django_filters.rest_framework import DjangoFilterBackend
 
-from .models import Room, TenantInquiry, LandlordInquiry, Colony
-from .serializers import RoomSerializer, TenantInquirySerializer, LandlordInquirySerializer, ColonySerializer
+from .models import Room, TenantInquiry, LandlordInquiry, Colony, SavedSearch, RoomChange, RentStat
+from .serializers import (
+    RoomSerializer, TenantInquirySerializer, LandlordInquirySerializer, ColonySerializer, SavedSearchSerializer,
+    RoomChangeSerializer, RentStatSerializer,
+)
+from .alerts import whatsapp_number
+from .analytics import stats_buffer
+from .suggest import suggest_index, MAX_SUGGESTIONS
+
+
+class RoomOrderingFilter(filters.OrderingFilter):
+    """Lets the frontend say ?ordering=popularity (most popular first)."""
+    aliases = {
+        'popularity': '-popularity_score',
+        '-popularity': 'popularity_score',
+    }
+
+    def remove_invalid_fields(self, queryset, fields, view, request):
+        fields = [self.aliases.get(term, term) for term in fields]
+        return super().remove_invalid_fields(queryset, fields, view, request)
+
 
 class RoomViewSet(viewsets.ModelViewSet):
     queryset = Room.objects.prefetch_related('images').all()
     serializer_class = RoomSerializer
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    filter_backends = [DjangoFilterBackend, filters.SearchFilter, RoomOrderingFilter]
     filterset_fields = ['room_type', 'is_available', 'colony_name', 'tenant_type']
     search_fields = [
         'title', 
@@ -25,7 +51,90 @@ class RoomViewSet(viewsets.ModelViewSet):
         'room_type',
         'tenant_type'
     ]
-    ordering_fields = ['price', 'created_at']
+    ordering_fields = ['price', 'created_at', 'popularity_score']
+
+    def retrieve(self, request, *args, **kwargs):
+        instance = self.get_object()
+        # Only counted in memory here, flushed to RoomStatHourly in bulk
+        stats_buffer.record_view(instance.pk)
+        serializer = self.get_serializer(instance)
+        return Response(serializer.data)
+
+    @action(detail=False, methods=['get'])
+    def changes(self, request):
+        """
+        Delta feed: /api/rooms/changes/?since=<last id you have>.
+        Without ?since you just get the current last_id to start from.
+        """
+        try:
+            since = int(request.query_params.get('since', ''))
+        except ValueError:
+            last = RoomChange.objects.order_by('-id').values_list('id', flat=True).first()
+            return Response({'last_id': last or 0, 'changes': [], 'has_more': False})
+
+        limit = settings.ROOM_CHANGES_PAGE_SIZE
+        changes = list(RoomChange.objects.filter(id__gt=since).order_by('id')[:limit + 1])
+        has_more = len(changes) > limit
+        changes = changes[:limit]
+
+        return Response({
+            'last_id': changes[-1].id if changes else since,
+            'changes': RoomChangeSerializer(changes, many=True).data,
+            'has_more': has_more,
+        })
+
+# --- LIVE ROOM CHANGES (SERVER-SENT EVENTS) ---
+
+async def room_changes_stream(request):
+    """
+    SSE version of /api/rooms/changes/, needs the ASGI app (backend.asgi, served by the uvicorn worker in the Procfile) to hold connections open.
+    Browsers reconnect on their own and send Last-Event-ID, so nothing gets missed.
+    """
+    # Under plain gunicorn/WSGI (or runserver) every open stream would pin a whole worker
+    if not isinstance(request, ASGIRequest):
+        return JsonResponse(
+            {'detail': "Streaming needs the ASGI server, poll /api/rooms/changes/?since=<last_id> instead."},
+            status=501,
+        )
+
+    try:
+        last_id = int(request.headers.get('Last-Event-ID') or request.GET.get('since', ''))
+    except ValueError:
+        last = await RoomChange.objects.order_by('-id').values_list('id', flat=True).afirst()
+        last_id = last or 0
+
+    async def events():
+        nonlocal last_id
+        yield f"retry: {settings.ROOM_CHANGES_POLL_SECONDS * 1000}\n\n"
+        last_sent = time.monotonic()
+        # Bounded, so a server restart or deploy never waits on long-lived connections
+        deadline = last_sent + settings.ROOM_CHANGES_STREAM_SECONDS
+        while True:
+            batch = [
+                change async for change in
+                RoomChange.objects.filter(id__gt=last_id).order_by('id')[:settings.ROOM_CHANGES_PAGE_SIZE]
+            ]
+            for change in batch:
+                last_id = change.id
+                data = json.dumps(RoomChangeSerializer(change).data)
+                yield f"id: {change.id}\nevent: room\ndata: {data}\n\n"
+
+            if time.monotonic() >= deadline:
+                return
+
+            # Comment line keeps proxies from closing an idle connection
+            if batch:
+                last_sent = time.monotonic()
+            elif time.monotonic() - last_sent > 15:
+                yield ": ping\n\n"
+                last_sent = time.monotonic()
+
+            await asyncio.sleep(settings.ROOM_CHANGES_POLL_SECONDS)
+
+    response = StreamingHttpResponse(events(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
 
 # --- OPTIMIZED VIEWS WITH BACKGROUND EMAIL ---
 
@@ -36,6 +145,7 @@ class TenantInquiryCreateView(generics.CreateAPIView):
     def perform_create(self, serializer):
         # Save to Database (Fast)
         instance = serializer.save()
+        stats_buffer.record_inquiry(instance.room_id)
         
         # Define the Email Task (To run in background)
         def send_email_task():
@@ -110,6 +220,27 @@ class ColonyListView(generics.ListAPIView):
     queryset = Colony.objects.all()
     serializer_class = ColonySerializer
 
+# What rooms go for per colony and room type, read straight from the precomputed RentStat rows
+class RentStatListView(generics.ListAPIView):
+    queryset = RentStat.objects.all()
+    serializer_class = RentStatSerializer
+    filter_backends = [DjangoFilterBackend]
+    filterset_fields = ['colony_name', 'room_type']
+
+# Search box typeahead, answered from the in-memory trie in api/suggest.py (no DB hit)
+class SuggestView(APIView):
+    def get(self, request):
+        try:
+            limit = max(1, min(int(request.query_params.get('limit', 8)), MAX_SUGGESTIONS))
+        except ValueError:
+            limit = 8
+        return Response(suggest_index.suggest(request.query_params.get('q', ''), limit))
+
+# Tenant registers once, gets a WhatsApp message when a matching room shows up (see api/alerts.py)
+class SavedSearchCreateView(generics.CreateAPIView):
+    queryset = SavedSearch.objects.all()
+    serializer_class = SavedSearchSerializer
+
 
 META_VERIFY_TOKEN = "apnaroom_secure_token_2026"
 META_ACCESS_TOKEN = "EAAdW7w2yz5oBQ64jL1jHWAzDzCPSgjSdNG1EFGilov7A3LjajzfmZCREssSQStENsvadnmfu8kVYy8vHg0QCiZCZBwLXWi9crdUq53dHGmW55dQXETYyqo7FIOuFThUqUS0NL8FFlr6tF975WLPs1zz3O61qDMjaWfenhLb4Vi3pRZACHzQm4HDfwdpSjIhGnAScc8TTnXelFYhBfl0V1iKzFcRr29B38t0PDldkwbZBC3MRN36tO61z95NTsaC6dlwoIlZAe4c0tAn9iKkDR0ZCLUFZBJ3nJYwzpbYzcgZDZD"
@@ -173,6 +304,13 @@ def whatsapp_webhook(request):
                         
                         return HttpResponse("EVENT_RECEIVED", status=200)
 
+                # ---  IF A TENANT WANTS TO STOP ROOM ALERTS ---
+                elif text_received.upper() == "STOP ALERTS":
+                    SavedSearch.objects.filter(phone_number=whatsapp_number(sender_phone), is_active=True).update(
+                        is_active=False, updated_at=timezone.now()
+                    )
+                    send_simple_whatsapp(sender_phone, "🔕 Room alerts stopped. You can set a new alert anytime on ApnaRoom.")
+
                 # ---  IF A TENANT SENDS A MESSAGE ---
                 else:
                     # Tell them to wait for verification
@@ -1,5 +1,6 @@
 from pathlib import Path
 import os
+import sys
 import certifi
 from dotenv import load_dotenv 
 import dj_database_url
@@ -20,6 +21,11 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 # SECURITY WARNING: keep the secret key used in production secret!
 SECRET_KEY = os.getenv('SECRET_KEY')
 
+# `manage.py test` has to run on CI and fresh checkouts without a .env
+TESTING = sys.argv[1:2] == ['test']
+if TESTING and not SECRET_KEY:
+    SECRET_KEY = 'django-insecure-test-only-key'
+
 # SECURITY WARNING: don't run with debug turned on in production!
 DEBUG = os.getenv('DEBUG') == 'False'
 
@@ -180,6 +186,14 @@ STORAGES = {
     "default": {
         "BACKEND": "cloudinary_storage.storage.MediaCloudinaryStorage",
     },
+    # HLS playlists (.m3u8) and segments (.ts), Cloudinary only accepts these as raw files
+    "hls": {
+        "BACKEND": "cloudinary_storage.storage.RawMediaCloudinaryStorage",
+    },
+    # Inquiry archives (.jsonl.gz), the app's own disk is wiped on every redeploy
+    "archives": {
+        "BACKEND": "cloudinary_storage.storage.RawMediaCloudinaryStorage",
+    },
     # Store CSS/JS files using WhiteNoise
     "staticfiles": {
         "BACKEND": "whitenoise.storage.CompressedManifestStaticFilesStorage",
@@ -193,3 +207,37 @@ CLOUDINARY_STORAGE = {
 }
 
 
+
+
+# Analytics (room views / inquiries are buffered in memory, then flushed in bulk)
+ANALYTICS_FLUSH_SECONDS = int(os.getenv('ANALYTICS_FLUSH_SECONDS', 60))
+ANALYTICS_MAX_BUFFER = int(os.getenv('ANALYTICS_MAX_BUFFER', 1000))
+
+
+# Saved-search WhatsApp alerts
+FRONTEND_URL = os.getenv('FRONTEND_URL', 'https://www.apnaroom.co.in')
+ALERT_FLUSH_SECONDS = int(os.getenv('ALERT_FLUSH_SECONDS', 60))
+ALERT_MIN_INTERVAL_SECONDS = int(os.getenv('ALERT_MIN_INTERVAL_SECONDS', 3600))
+
+
+# Room change feed (/api/rooms/changes/ and the SSE stream)
+ROOM_CHANGES_PAGE_SIZE = 500
+ROOM_CHANGES_POLL_SECONDS = int(os.getenv('ROOM_CHANGES_POLL_SECONDS', 2))
+# Each SSE connection ends after this long, the browser reconnects with Last-Event-ID
+ROOM_CHANGES_STREAM_SECONDS = int(os.getenv('ROOM_CHANGES_STREAM_SECONDS', 300))
+
+
+# Inquiry retention (python manage.py archive_inquiries)
+INQUIRY_RETENTION_DAYS = int(os.getenv('INQUIRY_RETENTION_DAYS', 180))
+INQUIRY_ARCHIVE_PREFIX = os.getenv('INQUIRY_ARCHIVE_PREFIX', 'archives/inquiries')
+
+
+# Video transcoding to HLS (needs ffmpeg/ffprobe on the server)
+FFMPEG_BINARY = os.getenv('FFMPEG_BINARY', 'ffmpeg')
+FFPROBE_BINARY = os.getenv('FFPROBE_BINARY', 'ffprobe')
+VIDEO_TRANSCODE_WORKERS = int(os.getenv('VIDEO_TRANSCODE_WORKERS', 1))
+VIDEO_TRANSCODE_TIMEOUT = int(os.getenv('VIDEO_TRANSCODE_TIMEOUT', 900))
+
+
+# Typeahead trie (/api/suggest/), rebuilt on catalog changes and at least this often
+SUGGEST_REFRESH_SECONDS = int(os.getenv('SUGGEST_REFRESH_SECONDS', 300))
@@ -3,7 +3,7 @@ from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
 from rest_framework.routers import DefaultRouter
-from api.views import RoomViewSet, TenantInquiryCreateView, LandlordInquiryCreateView, ColonyListView, whatsapp_webhook
+from api.views import RoomViewSet, TenantInquiryCreateView, LandlordInquiryCreateView, ColonyListView, SavedSearchCreateView, SuggestView, RentStatListView, room_changes_stream, whatsapp_webhook
 
 from django.urls import re_path
 from django.views.static import serve
@@ -15,11 +15,15 @@ urlpatterns = [
     path('admin/', admin.site.urls),
     
     # API Routes
+    path('api/rooms/changes/stream/', room_changes_stream, name='room-changes-stream'),
     path('api/', include(router.urls)), 
     
     path('api/inquire/tenant/', TenantInquiryCreateView.as_view(), name='tenant-inquiry'),
     path('api/inquire/landlord/', LandlordInquiryCreateView.as_view(), name='landlord-inquiry'),
     path('api/colonies/', ColonyListView.as_view(), name='colony-list'),
+    path('api/stats/rent/', RentStatListView.as_view(), name='rent-stats'),
+    path('api/suggest/', SuggestView.as_view(), name='suggest'),
+    path('api/saved-searches/', SavedSearchCreateView.as_view(), name='saved-search'),
 
     path('api/webhooks/whatsapp/', whatsapp_webhook, name='whatsapp_webhook'),
 ]